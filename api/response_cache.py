@@ -0,0 +1,66 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from config import RESPONSE_CACHE_MAX_ENTRIES
+
+@dataclass
+class CachedResponse:
+    """A serialized JSON response body and its strong ETag"""
+    body: bytes
+    etag: str
+
+class ResponseCache:
+    """Bounded LRU of serialized API responses, keyed by request params and data generation"""
+    
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+            return cached
+    
+    def set(self, key: Hashable, content: Any) -> CachedResponse:
+        """Serialize content the same way JSONResponse does and store it"""
+        body = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+        cached = CachedResponse(body=body, etag=f'"{hashlib.sha1(body).hexdigest()}"')
+        
+        with self._lock:
+            self._entries[key] = cached
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def respond(self, request: Request, key: Hashable, generation: int,
+                build: Callable[[], Dict]) -> Response:
+        """Serve a cached response for this generation, building it on a miss, with 304 on ETag match"""
+        cache_key = (key, generation)
+        cached = self.get(cache_key)
+        if cached is None:
+            cached = self.set(cache_key, build())
+        
+        headers = {'ETag': cached.etag, 'Cache-Control': 'no-cache'}
+        if _etag_matches(request.headers.get('if-none-match'), cached.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in (candidate[2:] if candidate.startswith('W/') else candidate for candidate in candidates)
@@ -1,28 +1,61 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from scheduler import setup_scheduler
-from config import logger
+from config import logger, STARTUP_COLLECTION_MAX_AGE_HOURS
 from contextlib import asynccontextmanager
-from services import collector_service
+from services import collector_service, job_manager, leader_elector
 from datetime import datetime
-from fastapi.responses import JSONResponse
+import time
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from api.response_cache import ResponseCache
+from api.streaming import NDJSON_MEDIA_TYPE, encode_ndjson
+from services.export import MEDIA_TYPES
+from monitoring import CONTENT_TYPE, REGISTRY, MetricsMiddleware
 import asyncio
+import os
 
-# Initialize scheduler
-setup_scheduler()
+# Serialized read responses, invalidated by the data generation counter
+response_cache = ResponseCache()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup
+async def start_initial_collection():
+    """Collect in the background if the stored data is stale; what is already in the database is served right away"""
     try:
-        await collector_service.collect_all_workflows()
-        logger.info("Initial workflow collection completed")
+        data_age_hours = await asyncio.to_thread(collector_service.get_data_age_hours)
+        if data_age_hours is not None and data_age_hours < STARTUP_COLLECTION_MAX_AGE_HOURS:
+            logger.info(f"Stored data is {data_age_hours:.1f}h old, skipping initial collection")
+        else:
+            job, _ = job_manager.submit('full')
+            logger.info(f"Initial workflow collection started in background (job {job.job_id})")
     except Exception as e:
         logger.error(f"Initial collection failed: {e}")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: every worker serves reads, only the elected leader schedules and runs collections
+    scheduler = None
+    
+    async def on_elected():
+        nonlocal scheduler
+        await job_manager.fail_orphaned_jobs()
+        scheduler = setup_scheduler()
+        await start_initial_collection()
+    
+    async def on_demoted():
+        nonlocal scheduler
+        if scheduler:
+            scheduler.shutdown(wait=False)
+            scheduler = None
+        # The new leader runs its own collections; stop ours so only one process writes
+        await job_manager.cancel("Lost leadership to another process")
+    
+    await leader_elector.start(on_elected, on_demoted, job_manager.adopt)
+
     yield  # App runs here
 
-    # Shutdown (optional)
+    # Shutdown
+    await leader_elector.stop()
+    await job_manager.flush()
+    await collector_service.close()
     logger.info("App is shutting down.")
 
 # Initialize FastAPI app
@@ -42,56 +75,267 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route request latency
+app.add_middleware(MetricsMiddleware)
+
 # Health check endpoint
 @app.get("/health", tags=["Health"])
 async def health_check():
     """Health check endpoint"""
-    return JSONResponse({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+    return JSONResponse({
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'role': 'leader' if leader_elector.is_leader else 'follower'
+    })
+
+# Metrics endpoint
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    """Metrics for this worker in the Prometheus text format"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 # Workflow endpoints
 @app.get("/workflows", tags=["Workflows"])
-async def get_workflows(platform: str = None, country: str = None):
-    """API endpoint to get workflows with optional filters"""    
-    workflows = collector_service.get_workflows_from_db(platform, country)
+async def get_workflows(request: Request, platform: str = None, country: str = None, sort_by: str = None,
+                        order: str = None, limit: int = Query(None, ge=1, le=1000), cursor: str = None):
+    """API endpoint to get workflows with optional filters, sorting and keyset pagination"""    
+    if NDJSON_MEDIA_TYPE in request.headers.get('accept', ''):
+        # The stream always covers every matching workflow, so paging parameters would be silently ignored
+        if limit is not None or cursor is not None:
+            return JSONResponse({'error': "limit and cursor are not supported when streaming NDJSON"},
+                                status_code=400)
+        return await stream_workflows(platform, country, sort_by, order)
     
-    return JSONResponse({
-        'total_count': len(workflows),
-        'filters': {
-            'platform': platform,
-            'country': country
-        },
-        'workflows': workflows
-    })
+    def build():
+        workflows, next_cursor = collector_service.get_workflow_page_from_db(
+            platform, country, sort_by, order, limit, cursor
+        )
+        return {
+            'total_count': len(workflows),
+            'filters': {
+                'platform': platform,
+                'country': country,
+                'sort_by': sort_by,
+                'order': order,
+                'limit': limit
+            },
+            'next_cursor': next_cursor,
+            'workflows': workflows
+        }
+    
+    try:
+        return response_cache.respond(
+            request,
+            ('workflows', platform, country, sort_by, order, limit, cursor),
+            collector_service.get_data_generation(),
+            build
+        )
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+@app.get("/workflows/stream", tags=["Workflows"])
+async def stream_workflows(platform: str = None, country: str = None, sort_by: str = None, order: str = None):
+    """API endpoint to stream all matching workflows as NDJSON with flat memory use"""    
+    try:
+        batches = collector_service.iter_workflow_rows_from_db(platform, country, sort_by, order)
+        # Validate the query before the 200 status goes out
+        first_batch = await asyncio.to_thread(next, batches, [])
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    
+    def chunks():
+        yield from encode_ndjson([first_batch])
+        yield from encode_ndjson(batches)
+    
+    return StreamingResponse(chunks(), media_type=NDJSON_MEDIA_TYPE)
+
+@app.get("/workflows/search", tags=["Workflows"])
+async def search_workflows(request: Request, q: str, platform: str = None, country: str = None,
+                           limit: int = Query(20, ge=1, le=100)):
+    """API endpoint to full-text search workflow titles, most relevant first"""    
+    def build():
+        workflows = collector_service.search_workflows_from_db(q, platform, country, limit)
+        return {
+            'total_count': len(workflows),
+            'filters': {
+                'q': q,
+                'platform': platform,
+                'country': country,
+                'limit': limit
+            },
+            'workflows': workflows
+        }
+    
+    try:
+        return response_cache.respond(
+            request,
+            ('search', q, platform, country, limit),
+            collector_service.get_data_generation(),
+            build
+        )
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+@app.get("/workflows/export", tags=["Workflows"])
+async def export_workflows(table: str = "workflows", fmt: str = Query("arrow", alias="format")):
+    """API endpoint to download the latest columnar export (Arrow IPC or Parquet) of workflows or their history"""    
+    exporter = collector_service.exporter
+    try:
+        path = exporter.path_for(table, fmt)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    
+    if not exporter.available:
+        return JSONResponse({'error': "Columnar export requires pyarrow, which is not installed"}, status_code=503)
+    if fmt not in exporter.formats:
+        return JSONResponse({'error': f"Format '{fmt}' is not enabled in EXPORT_FORMATS"}, status_code=404)
+    
+    # Exports are written after each collection; build one now if none has run yet
+    if not os.path.exists(path):
+        try:
+            await asyncio.to_thread(exporter.export)
+        except Exception as e:
+            logger.error(f"❌ Columnar export failed: {e}")
+            return JSONResponse({'error': f"Columnar export failed: {e}"}, status_code=503)
+    
+    return FileResponse(path, media_type=MEDIA_TYPES[fmt], filename=os.path.basename(path))
+
+@app.get("/workflows/trending", tags=["Workflows"])
+async def get_trending_workflows(request: Request, metric: str = "views", days: int = Query(7, ge=1, le=365),
+                                 platform: str = None, country: str = None,
+                                 limit: int = Query(20, ge=1, le=100)):
+    """API endpoint to get the workflows gaining a metric fastest, based on collected history"""    
+    def build():
+        workflows = collector_service.get_trending_workflows(metric, days, platform, country, limit)
+        return {
+            'total_count': len(workflows),
+            'filters': {
+                'metric': metric,
+                'days': days,
+                'platform': platform,
+                'country': country,
+                'limit': limit
+            },
+            'workflows': workflows
+        }
+    
+    try:
+        # The window slides with time, so cached results also expire on the hour
+        return response_cache.respond(
+            request,
+            ('trending', metric, days, platform, country, limit, int(time.time() // 3600)),
+            collector_service.get_data_generation(),
+            build
+        )
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+@app.get("/workflows/top", tags=["Workflows"])
+async def get_top_workflows(request: Request, platform: str = None, country: str = None,
+                            limit: int = Query(20, ge=1, le=1000)):
+    """API endpoint to get the highest ranked workflows by unified cross-platform score"""    
+    def build():
+        workflows = collector_service.get_top_workflows(platform, country, limit)
+        return {
+            'total_count': len(workflows),
+            'filters': {
+                'platform': platform,
+                'country': country,
+                'limit': limit
+            },
+            'workflows': workflows
+        }
+    
+    return response_cache.respond(
+        request,
+        ('top', platform, country, limit),
+        collector_service.get_data_generation(),
+        build
+    )
+
+@app.get("/workflows/clusters", tags=["Workflows"])
+async def get_workflow_clusters(request: Request, platform: str = None, country: str = None,
+                                min_size: int = Query(1, ge=1), limit: int = Query(20, ge=1, le=1000)):
+    """API endpoint to get popularity aggregated over clusters of near-duplicate workflows"""    
+    def build():
+        clusters = collector_service.get_workflow_clusters(platform, country, min_size, limit)
+        return {
+            'total_count': len(clusters),
+            'filters': {
+                'platform': platform,
+                'country': country,
+                'min_size': min_size,
+                'limit': limit
+            },
+            'clusters': clusters
+        }
+    
+    return response_cache.respond(
+        request,
+        ('clusters', platform, country, min_size, limit),
+        collector_service.get_data_generation(),
+        build
+    )
 
 # Workflow Refresh endpoint
 @app.post("/workflows/refresh", tags=["Workflows"])
-async def refresh_workflows():
-    """API endpoint to manually trigger workflow collection"""    
+async def refresh_workflows(mode: str = "full"):
+    """API endpoint to manually trigger workflow collection, joining the run already in flight if there is one"""    
+    try:
+        job_manager.check_kind(mode)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    
+    if not leader_elector.is_leader:
+        # Followers never collect; the leader picks the request up on its next heartbeat
+        try:
+            job_id, coalesced = await asyncio.to_thread(leader_elector.request_refresh, mode)
+        except Exception as e:
+            return JSONResponse({'error': str(e)}, status_code=500)
+        return JSONResponse({
+            'status': 'Collection already requested' if coalesced else 'Collection requested',
+            'message': 'Forwarded to the leader process',
+            'job_id': job_id,
+            'kind': mode,
+            'coalesced': coalesced,
+            'status_url': f"/workflows/refresh/{job_id}",
+            'leader': leader_elector.leader_id
+        }, status_code=202)
+    
+    try:
+        job, coalesced = job_manager.submit(mode)
+        # Record the job before handing out its URL, since the status poll may land on another worker
+        await job_manager.flush()
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+    
+    return JSONResponse({
+        'status': 'Collection already in progress' if coalesced else 'Collection started',
+        'message': 'Workflow data is being updated',
+        'job_id': job.job_id,
+        'kind': job.kind,
+        'coalesced': coalesced,
+        'status_url': f"/workflows/refresh/{job.job_id}"
+    }, status_code=202)
+
+@app.get("/workflows/refresh/{job_id}", tags=["Workflows"])
+async def get_refresh_status(job_id: str):
+    """API endpoint to get the progress, per-source timings and results of a collection job"""    
     try:
-        # Run collection in background
-        asyncio.create_task(collector_service.collect_all_workflows())
-        return JSONResponse({'status': 'Collection started', 'message': 'Workflow data is being updated'})
+        job = await job_manager.find(job_id)
     except Exception as e:
-        return JSONResponse({'error': str(e)}), 500
+        return JSONResponse({'error': str(e)}, status_code=500)
+    if not job:
+        return JSONResponse({'error': f"Unknown job '{job_id}'"}, status_code=404)
+    return JSONResponse(job.to_dict())
     
 # Workflow Stats endpoint
 @app.get("/workflows/stats", tags=["Workflows"])
-async def get_workflow_stats():
+async def get_workflow_stats(request: Request):
     """API endpoint to get statistics about collected workflows"""    
-    all_workflows = collector_service.get_workflows_from_db()
-    
-    stats = {
-        'total_workflows': len(all_workflows),
-        'by_platform': {},
-        'by_country': {},
-        'last_updated': max([w['last_updated'] for w in all_workflows]) if all_workflows else None
-    }
-    
-    for workflow in all_workflows:
-        platform = workflow['platform']
-        country = workflow['country']
-        
-        stats['by_platform'][platform] = stats['by_platform'].get(platform, 0) + 1
-        stats['by_country'][country] = stats['by_country'].get(country, 0) + 1
-    
-    return JSONResponse(stats)
+    return response_cache.respond(
+        request,
+        ('stats',),
+        collector_service.get_data_generation(),
+        collector_service.get_workflow_stats_from_db
+    )
@@ -0,0 +1,29 @@
+import json
+from typing import Iterator, List, Tuple
+
+try:
+    import orjson
+    
+    def _dumps(value) -> bytes:
+        return orjson.dumps(value)
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    def _dumps(value) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def encode_ndjson(batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """Encode batches of workflow rows as NDJSON, one chunk per batch
+    
+    popularity_metrics is spliced in as the JSON text already stored in the database.
+    """
+    for rows in batches:
+        yield b"".join(
+            b'{"workflow":' + _dumps(workflow) +
+            b',"platform":' + _dumps(platform) +
+            b',"popularity_metrics":' + popularity_metrics.encode("utf-8") +
+            b',"country":' + _dumps(country) +
+            b',"last_updated":' + _dumps(last_updated) +
+            b'}\n'
+            for workflow, platform, popularity_metrics, country, last_updated in rows
+        )
@@ -0,0 +1,3 @@
+from .fake_upstreams import FakeUpstreamConfig, FakeUpstreamStats, build_app, start_fake_upstreams
+
+__all__ = ['FakeUpstreamConfig', 'FakeUpstreamStats', 'build_app', 'start_fake_upstreams']
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import random
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+from aiohttp import web
+
+@dataclass
+class FakeUpstreamConfig:
+    """Behaviour of the local stand-ins for YouTube, Discourse and Google Trends"""
+    latency_ms: float = 50.0
+    latency_jitter_ms: float = 10.0
+    rate_limit_ratio: float = 0.0  # share of requests answered with 429
+    retry_after_seconds: float = 0.1
+    youtube_results_per_search: int = 25
+    youtube_unique_videos: int = 400  # search results are drawn from this pool, so queries overlap
+    forum_topics_per_page: int = 30
+    forum_pages: int = 5
+    trends_points: int = 30
+    padding_bytes: int = 0  # extra text per item to grow payloads
+    seed: int = 42
+
+@dataclass
+class FakeUpstreamStats:
+    """Requests served by the fakes, per route"""
+    requests: Dict[str, int] = field(default_factory=dict)
+    rate_limited: int = 0
+    
+    def to_dict(self):
+        return {'requests': dict(self.requests), 'total_requests': sum(self.requests.values()),
+                'rate_limited': self.rate_limited}
+
+def _stable_int(*parts) -> int:
+    return zlib.crc32('|'.join(str(part) for part in parts).encode())
+
+def build_app(config: FakeUpstreamConfig, stats: FakeUpstreamStats) -> web.Application:
+    """aiohttp app serving the upstream endpoints the collectors use, under /youtube, /forum and /trends"""
+    rng = random.Random(config.seed)
+    padding = 'x' * config.padding_bytes
+    
+    @web.middleware
+    async def upstream_behaviour(request: web.Request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        stats.requests[route] = stats.requests.get(route, 0) + 1
+        await asyncio.sleep(max(0.0, config.latency_ms + rng.uniform(-1, 1) * config.latency_jitter_ms) / 1000)
+        # The Trends cookie bootstrap runs in TrendReq's constructor, which has no retries
+        if config.rate_limit_ratio and not request.path.startswith('/trends/explore') \
+                and rng.random() < config.rate_limit_ratio:
+            stats.rate_limited += 1
+            return web.Response(status=429, headers={'Retry-After': str(config.retry_after_seconds)})
+        return await handler(request)
+    
+    # YouTube Data API v3
+    async def youtube_search(request: web.Request):
+        query, region = request.query.get('q', ''), request.query.get('regionCode', '')
+        count = min(config.youtube_results_per_search, int(request.query.get('maxResults', 25)))
+        start = _stable_int(query, region) % config.youtube_unique_videos
+        video_ids = [f"vid{(start + i) % config.youtube_unique_videos}" for i in range(count)]
+        return web.json_response({'items': [{'id': {'videoId': video_id}, 'snippet': {'description': padding}}
+                                            for video_id in video_ids]})
+    
+    async def youtube_videos(request: web.Request):
+        items = []
+        for video_id in request.query.get('id', '').split(','):
+            views = 100 + _stable_int(video_id) % 1_000_000
+            items.append({
+                'id': video_id,
+                'snippet': {'title': f"n8n workflow automation tutorial {video_id}", 'description': padding},
+                'statistics': {'viewCount': str(views), 'likeCount': str(views // 40),
+                               'commentCount': str(views // 400)}
+            })
+        return web.json_response({'items': items})
+    
+    # Discourse
+    def topic(topic_id: int, views: int) -> Dict:
+        return {'id': topic_id, 'title': f"Workflow automation question {topic_id}", 'views': views,
+                'like_count': views // 50, 'reply_count': views // 100, 'posts_count': views // 90 + 1,
+                'excerpt': padding}
+    
+    async def forum_list(request: web.Request):
+        feed = request.path
+        page = int(request.query.get('page', 0))
+        base_id = _stable_int(feed, request.query.get('period', '')) % 5000
+        # Views fall page by page and drop below the collector's threshold on the last page
+        views = 5000 if page < config.forum_pages - 1 else 10
+        topics = [topic(base_id + page * config.forum_topics_per_page + i, views - i)
+                  for i in range(config.forum_topics_per_page)]
+        topic_list = {'topics': topics}
+        if page + 1 < config.forum_pages:
+            path = feed[len('/forum'):].replace('.json', '')
+            topic_list['more_topics_url'] = f"{path}?page={page + 1}&period={request.query.get('period', '')}"
+        return web.json_response({'topic_list': topic_list})
+    
+    async def forum_topic(request: web.Request):
+        topic_id = int(request.match_info['topic_id'])
+        return web.json_response(topic(topic_id, 100 + _stable_int(topic_id) % 10000))
+    
+    # Google Trends, in the wire format pytrends parses
+    async def trends_cookie(request: web.Request):
+        response = web.Response(text='')
+        response.set_cookie('NID', 'benchmark')
+        return response
+    
+    async def trends_explore(request: web.Request):
+        widget_request = json.loads(request.query.get('req', '{}'))
+        widgets = [{'id': 'TIMESERIES', 'token': 'benchmark', 'request': widget_request}]
+        return web.Response(text=")]}'" + json.dumps({'widgets': widgets}), content_type='application/json')
+    
+    async def trends_multiline(request: web.Request):
+        keywords = [item['keyword'] for item in json.loads(request.query['req']).get('comparisonItem', [])]
+        now = int(time.time())
+        timeline = [{
+            'time': str(now - (config.trends_points - i) * 86400),
+            'value': [20 + _stable_int(keyword, i) % 60 for keyword in keywords],
+            'hasData': [True] * len(keywords)
+        } for i in range(config.trends_points)]
+        return web.Response(text=")]}',\n" + json.dumps({'default': {'timelineData': timeline}}),
+                            content_type='application/json')
+    
+    app = web.Application(middlewares=[upstream_behaviour])
+    app.router.add_get('/youtube/v3/search', youtube_search)
+    app.router.add_get('/youtube/v3/videos', youtube_videos)
+    app.router.add_get('/forum/top.json', forum_list)
+    app.router.add_get('/forum/latest.json', forum_list)
+    app.router.add_get('/forum/c/{category}/l/top.json', forum_list)
+    app.router.add_get('/forum/t/{topic_id}.json', forum_topic)
+    app.router.add_get('/trends/explore/', trends_cookie)
+    app.router.add_post('/trends/api/explore', trends_explore)
+    app.router.add_get('/trends/api/widgetdata/multiline', trends_multiline)
+    return app
+
+async def start_fake_upstreams(config: FakeUpstreamConfig) -> Tuple[web.AppRunner, str, FakeUpstreamStats]:
+    """Serve the fakes on a free local port; returns the runner, base URL and request stats"""
+    stats = FakeUpstreamStats()
+    runner = web.AppRunner(build_app(config, stats), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", stats
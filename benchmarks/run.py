@@ -0,0 +1,308 @@
+"""Offline benchmarks for collection, storage, export and the API.
+
+    python -m benchmarks.run --suites collect,save,export,api --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, List
+
+import aiohttp
+
+from benchmarks.fake_upstreams import FakeUpstreamConfig, start_fake_upstreams
+from database import DatabaseManager
+from schema import WorkflowMetrics, YouTubeMetrics, ForumMetrics, TrendsMetrics
+
+SUITES = ('collect', 'save', 'export', 'api')
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def synthetic_workflows(count: int, seed: int = 42) -> List[WorkflowMetrics]:
+    """Rows shaped like real collector output, spread over all platforms and countries"""
+    rng = random.Random(seed)
+    now = datetime.now().isoformat()
+    workflows = []
+    for i in range(count):
+        platform_name = ('YouTube', 'Forum', 'Google')[i % 3]
+        if platform_name == 'YouTube':
+            views = rng.randint(100, 2_000_000)
+            metrics = YouTubeMetrics(views=views, likes=views // 40, comments=views // 400,
+                                     like_to_view_ratio=0.025, comment_to_view_ratio=0.0025)
+        elif platform_name == 'Forum':
+            views = rng.randint(50, 50_000)
+            metrics = ForumMetrics(views=views, likes=views // 50, replies=views // 100, posts_count=views // 90 + 1,
+                                   engagement_score=0.07)
+        else:
+            metrics = TrendsMetrics(average_interest=round(rng.uniform(5, 100), 2), trend_change_percent=3.5,
+                                    peak_interest=100, search_consistency=12.4)
+        workflows.append(WorkflowMetrics(
+            workflow=f"n8n workflow {i}",
+            platform=platform_name,
+            popularity_metrics=metrics,
+            country='Global' if platform_name == 'Forum' else ('US', 'IN')[i % 2],
+            last_updated=now,
+            source_id=str(i)
+        ))
+    return workflows
+
+async def bench_collect(workdir: str, upstream: FakeUpstreamConfig) -> Dict:
+    """End-to-end collect_all_workflows against the local fakes, with the HTTP cache disabled"""
+    import pytrends.request
+    from services import WorkflowCollectorService
+    
+    runner, base_url, stats = await start_fake_upstreams(upstream)
+    
+    # Point pytrends at the fake; its endpoints are module and class constants
+    pytrends.request.BASE_TRENDS_URL = f"{base_url}/trends"
+    pytrends.request.TrendReq.GENERAL_URL = f"{base_url}/trends/api/explore"
+    pytrends.request.TrendReq.INTEREST_OVER_TIME_URL = f"{base_url}/trends/api/widgetdata/multiline"
+    
+    service = WorkflowCollectorService('benchmark')
+    service.http_cache = None
+    service.db_manager = DatabaseManager(os.path.join(workdir, 'collect.db'))
+    service.youtube_collector.base_url = f"{base_url}/youtube/v3"
+    service.forum_collector.base_url = f"{base_url}/forum"
+    
+    try:
+        start = time.perf_counter()
+        report = await service.collect_all_workflows()
+        wall_clock = time.perf_counter() - start
+    finally:
+        await service.close()
+        await runner.cleanup()
+    
+    return {
+        'wall_clock_seconds': round(wall_clock, 3),
+        'rows': report.total_count,
+        'sources': {name: {'status': source.status, 'count': source.count, 'seconds': source.duration_seconds}
+                    for name, source in report.sources.items()},
+        'upstream': stats.to_dict()
+    }
+
+def bench_save(workdir: str, sizes: List[int], batch_size: int) -> List[Dict]:
+    """Rows/sec through save_workflows, first as fresh inserts and then as upserts of the same keys
+    
+    Like a collection run, batches skip the summary rebuild and the summary is refreshed once per phase;
+    that refresh is included in the rate and also reported on its own.
+    """
+    results = []
+    for size in sizes:
+        path = os.path.join(workdir, f"save_{size}.db")
+        db_manager = DatabaseManager(path)
+        result = {'rows': size, 'batch_size': batch_size}
+        
+        for phase in ('insert', 'upsert'):
+            elapsed = 0.0
+            for offset in range(0, size, batch_size):
+                # Build each batch outside the timed region so only storage is measured
+                batch = synthetic_workflows(min(batch_size, size - offset), seed=offset)
+                for i, workflow in enumerate(batch):
+                    workflow.workflow = f"n8n workflow {offset + i}"
+                start = time.perf_counter()
+                db_manager.save_workflows(batch, update_summary=False)
+                elapsed += time.perf_counter() - start
+            
+            start = time.perf_counter()
+            db_manager.refresh_summary()
+            summary_seconds = time.perf_counter() - start
+            elapsed += summary_seconds
+            result[f"{phase}_summary_seconds"] = round(summary_seconds, 3)
+            result[f"{phase}_seconds"] = round(elapsed, 3)
+            result[f"{phase}_rows_per_second"] = round(size / elapsed, 1) if elapsed else None
+        
+        db_manager.close()
+        result['db_bytes'] = os.path.getsize(path)
+        results.append(result)
+        print(f"save {size} rows: {result['insert_rows_per_second']} inserts/s, "
+              f"{result['upsert_rows_per_second']} upserts/s", file=sys.stderr)
+    return results
+
+def bench_export(workdir: str, rows: int) -> Dict:
+    """Time to write the columnar export, then to load it memory-mapped versus decoding the stored JSON"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from services.export import ColumnarExporter
+    
+    db_manager = DatabaseManager(os.path.join(workdir, 'export.db'))
+    for offset in range(0, rows, 50_000):
+        db_manager.save_workflows(synthetic_workflows(min(50_000, rows - offset), seed=offset), update_summary=False)
+    exporter = ColumnarExporter(db_manager, directory=os.path.join(workdir, 'export'), formats=['arrow', 'parquet'])
+    
+    start = time.perf_counter()
+    exporter.export()
+    export_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    with pa.memory_map(exporter.path_for('workflows', 'arrow')) as source:
+        table = pa.ipc.open_file(source).read_all()
+        total_views = pc.sum(table['views']).as_py()
+    arrow_load_seconds = time.perf_counter() - start
+    
+    # What consumers of /workflows do today: decode every row's popularity_metrics before aggregating
+    start = time.perf_counter()
+    json_total_views = 0
+    for batch in db_manager.iter_workflow_rows(batch_size=5000):
+        for row in batch:
+            json_total_views += json.loads(row[2]).get('views') or 0
+    json_load_seconds = time.perf_counter() - start
+    db_manager.close()
+    
+    result = {
+        'rows': rows,
+        'export_seconds': round(export_seconds, 3),
+        'arrow_load_ms': round(arrow_load_seconds * 1000, 2),
+        'json_decode_ms': round(json_load_seconds * 1000, 2),
+        'views_match': total_views == json_total_views,
+        'file_bytes': {fmt: os.path.getsize(exporter.path_for('workflows', fmt)) for fmt in exporter.formats}
+    }
+    print(f"export {rows} rows: written in {result['export_seconds']}s, mmap load {result['arrow_load_ms']}ms "
+          f"vs JSON decode {result['json_decode_ms']}ms", file=sys.stderr)
+    return result
+
+async def bench_api(workdir: str, rows: int, paths: List[str], requests: int, concurrency: int) -> List[Dict]:
+    """p50/p99 latency of read endpoints served by uvicorn under concurrent load"""
+    import uvicorn
+    from api.routes import app
+    from services import collector_service
+    
+    db_manager = DatabaseManager(os.path.join(workdir, 'api.db'))
+    for offset in range(0, rows, 50_000):
+        db_manager.save_workflows(synthetic_workflows(min(50_000, rows - offset), seed=offset), update_summary=False)
+    db_manager.refresh_summary()
+    # Fresh data means the lifespan skips its startup collection
+    collector_service.db_manager = db_manager
+    
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=0, log_level='warning'))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+    
+    results = []
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+            for path in paths:
+                latencies = []
+                errors = 0
+                remaining = iter(range(requests))
+                
+                async def worker():
+                    nonlocal errors
+                    for _ in remaining:
+                        start = time.perf_counter()
+                        async with session.get(base_url + path) as response:
+                            await response.read()
+                            if response.status != 200:
+                                errors += 1
+                        latencies.append(time.perf_counter() - start)
+                
+                start = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+                elapsed = time.perf_counter() - start
+                
+                latencies.sort()
+                results.append({
+                    'path': path,
+                    'requests': requests,
+                    'concurrency': concurrency,
+                    'errors': errors,
+                    'requests_per_second': round(requests / elapsed, 1),
+                    'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                    'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+                    'max_ms': round(latencies[-1] * 1000, 2)
+                })
+                print(f"api {path}: p50 {results[-1]['p50_ms']}ms, p99 {results[-1]['p99_ms']}ms", file=sys.stderr)
+    finally:
+        server.should_exit = True
+        await serve_task
+    return results
+
+def environment() -> Dict:
+    """Where the numbers came from"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+async def run(args: argparse.Namespace) -> Dict:
+    upstream = FakeUpstreamConfig(latency_ms=args.latency_ms, rate_limit_ratio=args.rate_limit_ratio,
+                                  padding_bytes=args.padding_bytes, forum_pages=args.forum_pages)
+    results = {'environment': environment(), 'config': {'upstream': asdict(upstream), **vars(args)}}
+    
+    with tempfile.TemporaryDirectory(prefix='n8n-bench-') as workdir:
+        if 'collect' in args.suites:
+            results['collect'] = await bench_collect(workdir, upstream)
+            print(f"collect: {results['collect']['wall_clock_seconds']}s for {results['collect']['rows']} rows",
+                  file=sys.stderr)
+        if 'save' in args.suites:
+            results['save'] = await asyncio.to_thread(bench_save, workdir, args.save_rows, args.save_batch)
+        if 'export' in args.suites:
+            results['export'] = await asyncio.to_thread(bench_export, workdir, args.export_rows)
+        if 'api' in args.suites:
+            results['api'] = await bench_api(workdir, args.api_rows, args.api_paths, args.api_requests,
+                                             args.api_concurrency)
+    return results
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    def int_list(value: str) -> List[int]:
+        return [int(item) for item in value.split(',') if item]
+    
+    def str_list(value: str) -> List[str]:
+        return [item for item in value.split(',') if item]
+    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suites', type=str_list, default=list(SUITES), help='comma-separated: collect,save,export,api')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='fake upstream latency per request')
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.05, help='share of upstream requests answered 429')
+    parser.add_argument('--padding-bytes', type=int, default=0, help='extra bytes per upstream item')
+    parser.add_argument('--forum-pages', type=int, default=5, help='pages per forum feed')
+    parser.add_argument('--save-rows', type=int_list, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--save-batch', type=int, default=50_000, help='rows per save_workflows call')
+    parser.add_argument('--export-rows', type=int, default=1_000_000, help='rows in the database that is exported')
+    parser.add_argument('--api-rows', type=int, default=10_000, help='rows in the database served by the API')
+    parser.add_argument('--api-paths', type=str_list,
+                        default=['/workflows?limit=100&sort_by=views', '/workflows', '/workflows/stats'])
+    parser.add_argument('--api-requests', type=int, default=2000, help='requests per path')
+    parser.add_argument('--api-concurrency', type=int, default=32)
+    args = parser.parse_args(argv)
+    
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    return args
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 from .youtube_collector import YouTubeCollector
 from .forum_collector import ForumCollector
 from .google_trends_collector import GoogleTrendsCollector
+from .http_cache import HttpCache
+from .http_client import HttpClient, CircuitOpenError
 
-__all__ = ['YouTubeCollector', 'ForumCollector', 'GoogleTrendsCollector']
\ No newline at end of file
+__all__ = ['YouTubeCollector', 'ForumCollector', 'GoogleTrendsCollector', 'HttpCache', 'HttpClient', 'CircuitOpenError']
\ No newline at end of file
@@ -1,49 +1,165 @@
-from config import logger
+from config import (logger, FORUM_MAX_CONCURRENCY, FORUM_REQUESTS_PER_SECOND, FORUM_TOP_PERIODS,
+                    FORUM_CATEGORIES, FORUM_MAX_PAGES, FORUM_LATEST_MAX_PAGES, FORUM_MIN_VIEWS, FORUM_BATCH_SIZE,
+                    FORUM_REFRESH_MAX_TOPICS, SOURCE_TIMEOUTS)
+import asyncio
+import re
 from datetime import datetime
-from typing import Dict, List, Optional
-import aiohttp
-from schema import WorkflowMetrics
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from schema import WorkflowMetrics, ForumMetrics
+from .http_cache import HttpCache, fetch_json
+from .http_client import HttpClient
+from .rate_limiter import AsyncRateLimiter
+
+# Topics are kept only if their title mentions one of these
+WORKFLOW_KEYWORDS_PATTERN = re.compile(r'workflow|automation|integration|template|tutorial', re.IGNORECASE)
 
 class ForumCollector:
     """Collects n8n workflow data from n8n community forum"""
     
-    def __init__(self, base_url: str = "https://community.n8n.io"):
+    def __init__(self, base_url: str = "https://community.n8n.io", cache: HttpCache = None,
+                 max_concurrency: int = FORUM_MAX_CONCURRENCY, requests_per_second: float = FORUM_REQUESTS_PER_SECOND,
+                 top_periods: List[str] = None, categories: List[str] = None, max_pages: int = FORUM_MAX_PAGES,
+                 batch_size: int = FORUM_BATCH_SIZE, http_client: HttpClient = None,
+                 latest_max_pages: int = FORUM_LATEST_MAX_PAGES, refresh_max_topics: int = FORUM_REFRESH_MAX_TOPICS):
         self.base_url = base_url
+        self.cache = cache
+        self.http_client = http_client or HttpClient()
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_second = requests_per_second
+        self.top_periods = FORUM_TOP_PERIODS if top_periods is None else top_periods
+        self.categories = FORUM_CATEGORIES if categories is None else categories
+        self.max_pages = max(1, max_pages)
+        self.batch_size = max(1, batch_size)
+        self.latest_max_pages = max(1, latest_max_pages)
+        self.refresh_max_topics = max(1, refresh_max_topics)
+        
+        timeout = SOURCE_TIMEOUTS.get('Forum')
+        if timeout and self.requests_per_second > 0:
+            pages = sum(feed_pages for _, _, feed_pages, _ in self._feeds())
+            if pages / self.requests_per_second > timeout:
+                logger.warning(f"⚠️ A full forum crawl ({pages} pages at {self.requests_per_second} req/s) "
+                               f"can take longer than FORUM_TIMEOUT ({timeout}s)")
+            if self.refresh_max_topics / self.requests_per_second > timeout:
+                logger.warning(f"⚠️ An incremental forum refresh ({self.refresh_max_topics} topics at "
+                               f"{self.requests_per_second} req/s) can take longer than FORUM_TIMEOUT ({timeout}s)")
     
-    async def collect_popular_topics(self) -> List[WorkflowMetrics]:
-        """Collect popular topics from n8n forum"""
-        workflows = []
+    async def collect_popular_topics(self, on_batch: Callable[[List[WorkflowMetrics]], Awaitable[None]] = None
+                                     ) -> List[WorkflowMetrics]:
+        """Crawl every topic feed page by page; with `on_batch`, hand off results in batches instead of returning them"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = AsyncRateLimiter(self.requests_per_second)
+        seen_topic_ids = set()
+        buffer = []
         
-        async with aiohttp.ClientSession() as session:
-            try:
-                # Get popular topics
-                topics_url = f"{self.base_url}/top.json"
+        async def flush():
+            nonlocal buffer
+            batch, buffer = buffer, []
+            if batch:
+                await on_batch(batch)
+        
+        async def crawl_feed(path: str, params: Optional[Dict], max_pages: int, ranked: bool):
+            url = f"{self.base_url}/{path}"
+            for _ in range(max_pages):
+                async with semaphore:
+                    data = await fetch_json(self.http_client, url, params, cache=self.cache, source="Forum",
+                                            limiter=limiter)
+                if not data:
+                    return
                 
-                async with session.get(topics_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        for topic in data.get('topic_list', {}).get('topics', []):
-                            workflow = self._parse_forum_topic(topic)
-                            if workflow:
-                                workflows.append(workflow)
+                topic_list = data.get('topic_list', {})
+                topics = topic_list.get('topics', [])
+                for topic in topics:
+                    if topic.get('id') in seen_topic_ids:
+                        continue
+                    workflow = self._parse_forum_topic(topic)
+                    if workflow:
+                        seen_topic_ids.add(topic.get('id'))
+                        buffer.append(workflow)
                 
-                # Get latest topics for additional coverage
-                latest_url = f"{self.base_url}/latest.json"
+                if on_batch and len(buffer) >= self.batch_size:
+                    await flush()
                 
-                async with session.get(latest_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        for topic in data.get('topic_list', {}).get('topics', []):
-                            workflow = self._parse_forum_topic(topic)
-                            if workflow and workflow not in workflows:
-                                workflows.append(workflow)
-            
+                # Top feeds are ordered by engagement, so a page with nothing above the threshold ends the crawl.
+                # Latest is ordered by recency and always reads its pages.
+                if ranked and not any(topic.get('views', 0) >= FORUM_MIN_VIEWS for topic in topics):
+                    return
+                
+                more_topics_url = topic_list.get('more_topics_url')
+                if not more_topics_url:
+                    return
+                url, params = self._next_page_url(more_topics_url), None
+        
+        async def crawl(path: str, params: Optional[Dict], max_pages: int, ranked: bool):
+            try:
+                await crawl_feed(path, params, max_pages, ranked)
             except Exception as e:
-                logger.error(f"Error fetching forum data: {e}")
+                logger.error(f"Error fetching forum feed {path} {params or ''}: {e}")
+        
+        await asyncio.gather(*(crawl(*feed) for feed in self._feeds()))
+        
+        if on_batch:
+            await flush()
+            return []
+        return buffer
+    
+    def _feeds(self) -> List[Tuple[str, Optional[Dict], int, bool]]:
+        """Topic lists to crawl as (path, params, max pages, ranked by engagement)
+        
+        Top for each period, latest, and top of each workflow category.
+        """
+        feeds = [("top.json", {"period": period}, self.max_pages, True) for period in self.top_periods]
+        feeds.append(("latest.json", None, self.latest_max_pages, False))
+        feeds.extend((f"c/{category}/l/top.json", {"period": "all"}, self.max_pages, True)
+                     for category in self.categories)
+        return feeds
+    
+    def _next_page_url(self, more_topics_url: str) -> str:
+        """Turn Discourse's `more_topics_url` (an HTML route) into its JSON equivalent"""
+        parts = urlsplit(more_topics_url)
+        path = parts.path if parts.path.endswith('.json') else f"{parts.path}.json"
+        query = f"?{parts.query}" if parts.query else ""
+        return f"{self.base_url}{path}{query}"
+    
+    async def refresh_topics(self, topic_ids: List[str],
+                             on_batch: Callable[[List[WorkflowMetrics]], Awaitable[None]] = None
+                             ) -> List[WorkflowMetrics]:
+        """Re-poll known topics by ID instead of re-reading the topic lists
+        
+        With `on_batch`, results are handed off in batches as they arrive instead of being returned,
+        so a run cut off by its deadline keeps what it already fetched.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = AsyncRateLimiter(self.requests_per_second)
+        buffer = []
+        
+        async def flush():
+            nonlocal buffer
+            batch, buffer = buffer, []
+            if batch:
+                await on_batch(batch)
+        
+        async def fetch_topic(topic_id: str):
+            async with semaphore:
+                try:
+                    data = await fetch_json(self.http_client, f"{self.base_url}/t/{topic_id}.json",
+                                            cache=self.cache, source="Forum", limiter=limiter)
+                    workflow = self._parse_forum_topic(data) if data else None
+                except Exception as e:
+                    logger.error(f"Error refreshing forum topic {topic_id}: {e}")
+                    return
+            
+            if workflow:
+                buffer.append(workflow)
+            if on_batch and len(buffer) >= self.batch_size:
+                await flush()
+        
+        await asyncio.gather(*(fetch_topic(topic_id) for topic_id in topic_ids))
         
-        return workflows
+        if on_batch:
+            await flush()
+            return []
+        return buffer
     
     def _parse_forum_topic(self, topic_data: Dict) -> Optional[WorkflowMetrics]:
         """Parse forum topic into WorkflowMetrics"""
@@ -55,26 +171,26 @@ class ForumCollector:
             posts_count = topic_data.get('posts_count', 0)
             
             # Filter for workflow-related topics
-            workflow_keywords = ['workflow', 'automation', 'integration', 'template', 'tutorial']
-            if not any(keyword in title.lower() for keyword in workflow_keywords):
+            if not WORKFLOW_KEYWORDS_PATTERN.search(title):
                 return None
             
             # Skip low-engagement topics
-            if views < 50:
+            if views < FORUM_MIN_VIEWS:
                 return None
             
             return WorkflowMetrics(
                 workflow=title,
                 platform="Forum",
-                popularity_metrics={
-                    "views": views,
-                    "likes": likes,
-                    "replies": replies,
-                    "posts_count": posts_count,
-                    "engagement_score": (likes * 2 + replies * 3) / max(views, 1)
-                },
+                popularity_metrics=ForumMetrics(
+                    views=views,
+                    likes=likes,
+                    replies=replies,
+                    posts_count=posts_count,
+                    engagement_score=(likes * 2 + replies * 3) / max(views, 1)
+                ),
                 country="Global",  # Forum is global
-                last_updated=datetime.now().isoformat()
+                last_updated=datetime.now().isoformat(),
+                source_id=str(topic_data['id']) if topic_data.get('id') is not None else None
             )
         
         except Exception as e:
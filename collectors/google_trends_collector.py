@@ -1,125 +1,214 @@
-from config import logger
+from config import logger, TRENDS_REQUESTS_PER_SECOND, HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE_SECONDS
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List
-from schema import WorkflowMetrics
-from pytrends.request import TrendReq
-import time
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
-import requests
+import json
+import statistics
+from typing import Dict, List, Optional
+from schema import WorkflowMetrics, TrendsMetrics
+from .http_cache import HttpCache
+from .http_client import CircuitOpenError, HttpClient
+from .rate_limiter import AsyncRateLimiter
 
 class GoogleTrendsCollector:
     """Collects n8n workflow popularity data from Google Trends"""
     
-    def __init__(self):
-        # Retry config
-        # retries = 3
-        # backoff_factor = 0.3
-        # retry_strategy = Retry(
-        #     total=retries,
-        #     read=retries,
-        #     connect=retries,
-        #     backoff_factor=backoff_factor,
-        #     status_forcelist=[429, 500, 502, 503, 504],
-        #     allowed_methods=frozenset(['GET', 'POST'])
-        # )
-
-        # # Session with retry
-        # adapter = HTTPAdapter(max_retries=retry_strategy)
-        # session = requests.Session()
-        # session.mount("https://", adapter)
-        # session.mount("http://", adapter)
-        self.pytrends = TrendReq(
-            hl='en-US',
-            tz=360,
-            timeout=(10, 25),
-            # requests_args={'verify': False},
-            retries=2,
-            backoff_factor=0.5
-        )
-        # self.pytrends._requests_session = session
+    TIMEFRAME = 'today 1-m'  # Last 1 month
+    
+    # pytrends accepts at most 5 keywords per payload
+    BATCH_SIZE = 5
+    
+    # Common n8n workflow keywords. The first one is the anchor that is repeated in
+    # every batch so interest scores can be rescaled onto a common scale.
+    WORKFLOW_KEYWORDS = [
+        "n8n slack automation",
+        "n8n google sheets integration",
+        "n8n email automation",
+        "n8n webhook workflow",
+        "n8n database automation",
+        # "n8n api integration",
+        # "n8n discord bot",
+        # "n8n twitter automation",
+        # "n8n notion integration",
+        # "n8n airtable workflow",
+        # "n8n telegram bot",
+        # "n8n shopify automation",
+        # "n8n wordpress integration",
+        # "n8n github automation",
+        # "n8n jira integration"
+    ]
+    
+    TRENDS_HOST = 'trends.google.com'
+    
+    def __init__(self, cache: HttpCache = None, requests_per_second: float = TRENDS_REQUESTS_PER_SECOND,
+                 http_client: HttpClient = None):
+        self.cache = cache
+        self.limiter = AsyncRateLimiter(requests_per_second)
+        # pytrends has its own requests session, but shares the circuit breaker registry with the other collectors
+        self.breaker = (http_client or HttpClient()).breaker_for(self.TRENDS_HOST)
+        # pytrends is blocking and keeps session state, so every call goes through one worker thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="google-trends")
+        self._pytrends = None
+    
+    @property
+    def pytrends(self):
+        """pytrends client, created on first use from the Trends worker thread"""
+        if self._pytrends is None:
+            # pytrends pulls in pandas and its constructor makes a network request, so keep both out of startup
+            from pytrends.request import TrendReq
+            
+            # pytrends mounts a urllib3 Retry adapter from these settings, which retries 429/5xx
+            # with exponential backoff and honors Retry-After
+            self._pytrends = TrendReq(
+                hl='en-US',
+                tz=360,
+                timeout=(10, 25),
+                # requests_args={'verify': False},
+                retries=HTTP_MAX_RETRIES,
+                backoff_factor=HTTP_BACKOFF_BASE_SECONDS
+            )
+        return self._pytrends
 
-    def collect_trending_workflows(self, country: str = "US") -> List[WorkflowMetrics]:
-        """Collect trending n8n workflows from Google Trends"""
+    async def collect_trending_workflows(self, country: str = "US") -> List[WorkflowMetrics]:
+        """Collect trending n8n workflows from Google Trends without blocking the event loop"""
         workflows = []
+        loop = asyncio.get_running_loop()
+        geo_code = country if country in ['US', 'IN'] else 'US'
+        anchor = self.WORKFLOW_KEYWORDS[0]
+        reference_anchor_mean = None
+        reported = set()
         
-        # Common n8n workflow keywords
-        workflow_keywords = [
-            "n8n slack automation",
-            "n8n google sheets integration",
-            "n8n email automation",
-            "n8n webhook workflow",
-            "n8n database automation",
-            # "n8n api integration",
-            # "n8n discord bot",
-            # "n8n twitter automation",
-            # "n8n notion integration",
-            # "n8n airtable workflow",
-            # "n8n telegram bot",
-            # "n8n shopify automation",
-            # "n8n wordpress integration",
-            # "n8n github automation",
-            # "n8n jira integration"
-        ]
-        
-        # Process keywords in batches (Google Trends API limitation)
-        batch_size = 1
-        for i in range(0, len(workflow_keywords), batch_size):
-            batch = workflow_keywords[i:i + batch_size]
-            
+        for batch in self._keyword_batches():
+            probe = False
             try:
-                # Set up trends request
-                geo_code = country if country in ['US', 'IN'] else 'US'
-                self.pytrends.build_payload(
-                    kw_list=batch,
-                    cat=0, 
-                    timeframe='today 1-m',  # Last 1 month
-                    geo=geo_code,
-                    gprop=''
-                )
-                
-                # Get interest over time
-                interest_data = self.pytrends.interest_over_time()
-                
-                if not interest_data.empty:
-                    for keyword in batch:
-                        if keyword in interest_data.columns:
-                            avg_interest = interest_data[keyword].mean()
-                            recent_trend = self._calculate_trend_change(interest_data[keyword])
-                            
-                            if avg_interest > 5:  # Only include keywords with meaningful search volume
-                                workflow = WorkflowMetrics(
-                                    workflow=keyword.replace("n8n ", "").title(),
-                                    platform="Google",
-                                    popularity_metrics={
-                                        "average_interest": round(avg_interest, 2),
-                                        "trend_change_percent": round(recent_trend, 2),
-                                        "peak_interest": int(interest_data[keyword].max()),
-                                        "search_consistency": round(interest_data[keyword].std(), 2)
-                                    },
-                                    country=country,
-                                    last_updated=datetime.now().isoformat()
-                                )
-                                workflows.append(workflow)
-                
-                # Rate limiting
-                time.sleep(1)
-                
+                interest_data = await loop.run_in_executor(self._executor, self._cached_interest, batch, geo_code)
+                if interest_data is None:
+                    probe = self.breaker.before_request()
+                    await self.limiter.acquire()
+                    interest_data = await loop.run_in_executor(self._executor, self._fetch_interest, batch, geo_code)
+                    self.breaker.record_success()
+            
+            except asyncio.CancelledError:
+                # The source deadline cut this batch off; a cancelled probe must not keep the breaker half-open
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            
+            except CircuitOpenError as e:
+                # Google is rate limiting us or down; skip the remaining batches rather than hammering it
+                logger.error(f"Skipping remaining Google Trends batches for {country}: {e}")
+                break
+            
             except Exception as e:
+                response = getattr(e, 'response', None)
+                if getattr(response, 'status_code', None) == 429:
+                    # Still rate limited after pytrends' own retries, so back off for a full reset period
+                    self.breaker.trip(self.breaker.reset_seconds)
+                else:
+                    self.breaker.record_failure()
                 logger.error(f"Error fetching Google Trends data for batch {batch}: {e}")
-                time.sleep(2)  # Longer wait on error
+                await asyncio.sleep(2)  # Longer wait on error
+                continue
+            
+            # Trends scores are relative within a payload, so rescale each batch to the first anchor reading
+            scale = 1.0
+            if interest_data.get(anchor):
+                anchor_mean = statistics.mean(interest_data[anchor])
+                if reference_anchor_mean is None:
+                    reference_anchor_mean = anchor_mean
+                elif anchor_mean > 0:
+                    scale = reference_anchor_mean / anchor_mean
+            
+            for keyword in batch:
+                # The anchor is reported once, from the batch that set the reference scale
+                if keyword in interest_data and keyword not in reported:
+                    reported.add(keyword)
+                    workflow = self._build_workflow(keyword, [value * scale for value in interest_data[keyword]], country)
+                    if workflow:
+                        workflows.append(workflow)
         
         return workflows
     
-    def _calculate_trend_change(self, series) -> float:
+    def _keyword_batches(self) -> List[List[str]]:
+        """Split keywords into payloads that all share the anchor keyword"""
+        anchor, others = self.WORKFLOW_KEYWORDS[0], self.WORKFLOW_KEYWORDS[1:]
+        if not others:
+            return [[anchor]]
+        
+        step = self.BATCH_SIZE - 1
+        return [[anchor] + others[i:i + step] for i in range(0, len(others), step)]
+    
+    def _build_workflow(self, keyword: str, series: List[float], country: str) -> Optional[WorkflowMetrics]:
+        """Turn a keyword's interest series into WorkflowMetrics"""
+        if not series:
+            return None
+        
+        avg_interest = statistics.mean(series)
+        recent_trend = self._calculate_trend_change(series)
+        
+        # Only include keywords with meaningful search volume
+        if avg_interest <= 5:
+            return None
+        
+        return WorkflowMetrics(
+            workflow=keyword.replace("n8n ", "").title(),
+            platform="Google",
+            popularity_metrics=TrendsMetrics(
+                average_interest=round(avg_interest, 2),
+                trend_change_percent=round(recent_trend, 2),
+                peak_interest=int(max(series)),
+                search_consistency=round(statistics.stdev(series), 2) if len(series) > 1 else 0.0
+            ),
+            country=country,
+            last_updated=datetime.now().isoformat(),
+            source_id=keyword
+        )
+    
+    def _interest_cache_key(self, keywords: List[str], geo: str) -> str:
+        return HttpCache.make_key('trends://interest_over_time',
+                                  {'kw_list': ','.join(keywords), 'geo': geo, 'timeframe': self.TIMEFRAME})
+    
+    def _cached_interest(self, keywords: List[str], geo: str) -> Optional[Dict[str, List[float]]]:
+        """Return a fresh cached interest series for a keyword batch, if there is one"""
+        if not self.cache:
+            return None
+        entry = self.cache.get(self._interest_cache_key(keywords, geo))
+        if entry and entry.is_fresh:
+            return json.loads(entry.body)
+        return None
+    
+    def _fetch_interest(self, keywords: List[str], geo: str) -> Dict[str, List[float]]:
+        """Fetch interest over time for a keyword batch from Google Trends and cache it"""
+        self.pytrends.build_payload(
+            kw_list=keywords,
+            cat=0,
+            timeframe=self.TIMEFRAME,
+            geo=geo,
+            gprop=''
+        )
+        
+        # Get interest over time
+        interest_data = self.pytrends.interest_over_time()
+        series = {
+            keyword: [float(value) for value in interest_data[keyword]]
+            for keyword in keywords
+            if not interest_data.empty and keyword in interest_data.columns
+        }
+        
+        if self.cache:
+            self.cache.set(self._interest_cache_key(keywords, geo), 'trends://interest_over_time',
+                           json.dumps(series).encode(), self.cache.ttl_for("Google"))
+        return series
+    
+    def _calculate_trend_change(self, series: List[float]) -> float:
         """Calculate trend change percentage over the time period"""
         if len(series) < 4:
             return 0.0
         
         # Compare last quarter to previous quarter
         quarter_size = len(series) // 4
-        recent_avg = series[-quarter_size:].mean()
-        previous_avg = series[-2*quarter_size:-quarter_size].mean()
+        recent_avg = statistics.mean(series[-quarter_size:])
+        previous_avg = statistics.mean(series[-2*quarter_size:-quarter_size])
         
         if previous_avg > 0:
             return ((recent_avg - previous_avg) / previous_avg) * 100
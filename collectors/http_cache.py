@@ -0,0 +1,172 @@
+from config import logger, HTTP_CACHE_PATH, HTTP_CACHE_MAX_MB, HTTP_CACHE_TTLS
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from monitoring.instruments import HTTP_CACHE_LOOKUPS_TOTAL
+from .http_client import HttpClient
+from .rate_limiter import AsyncRateLimiter
+
+# Params that identify the caller rather than the resource
+IGNORED_PARAMS = {'key'}
+
+@dataclass
+class CacheEntry:
+    """A cached upstream response"""
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+    
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+class HttpCache:
+    """On-disk response cache shared by all collectors, with per-source TTLs and LRU eviction"""
+    
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_mb: float = HTTP_CACHE_MAX_MB,
+                 ttls: Dict[str, int] = None):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttls = ttls if ttls is not None else HTTP_CACHE_TTLS
+        self._lock = threading.Lock()
+        # Reads only note their access time here; it is written out with the next store, before eviction
+        self._accessed: Dict[str, float] = {}
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # Shared between the event loop and the Trends worker thread, guarded by _lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)')
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(url: str, params: Dict = None) -> str:
+        """Build a cache key from the URL and its params, ignoring API credentials"""
+        items = sorted((str(k), str(v)) for k, v in (params or {}).items() if k not in IGNORED_PARAMS)
+        return hashlib.sha256(json.dumps([url, items]).encode()).hexdigest()
+    
+    def ttl_for(self, source: str) -> int:
+        return self.ttls.get(source, 0)
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Look up an entry, fresh or stale, and mark it as recently used"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT body, etag, last_modified, expires_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+        return CacheEntry(*row)
+    
+    def set(self, key: str, url: str, body: bytes, ttl: int, etag: str = None, last_modified: str = None):
+        """Store a response and evict least recently used entries beyond the size limit"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO responses
+                (key, url, body, etag, last_modified, expires_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, url, body, etag, last_modified, now + ttl, now, len(body)))
+            self._accessed.pop(key, None)
+            self._flush_access()
+            self._evict()
+            self._conn.commit()
+    
+    def refresh(self, key: str, ttl: int):
+        """Extend the lifetime of an entry that the upstream confirmed is unchanged"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('UPDATE responses SET expires_at = ?, last_access = ? WHERE key = ?',
+                               (now + ttl, now, key))
+            self._accessed.pop(key, None)
+            self._flush_access()
+            self._conn.commit()
+    
+    def _flush_access(self):
+        """Write the access times noted by get() so eviction sees them"""
+        if self._accessed:
+            self._conn.executemany('UPDATE responses SET last_access = ? WHERE key = ?',
+                                   [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed.clear()
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        evicted = 0
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"HTTP cache evicted {evicted} entries")
+    
+    async def get_json(self, client: HttpClient, url: str, params: Dict = None,
+                       source: str = None, limiter: AsyncRateLimiter = None) -> Optional[Any]:
+        """GET a JSON resource through the cache, revalidating stale entries when possible"""
+        key = self.make_key(url, params)
+        ttl = self.ttl_for(source)
+        # SQLite I/O runs in a worker thread so cache lookups don't stall the event loop
+        entry = await asyncio.to_thread(self.get, key)
+        
+        if entry and entry.is_fresh:
+            HTTP_CACHE_LOOKUPS_TOTAL.inc(source or "unknown", "hit")
+            return json.loads(entry.body)
+        
+        headers = {}
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        
+        response = await client.get(url, params=params, headers=headers, limiter=limiter, source=source)
+        if response.status == 304 and entry:
+            HTTP_CACHE_LOOKUPS_TOTAL.inc(source or "unknown", "revalidated")
+            await asyncio.to_thread(self.refresh, key, ttl)
+            return json.loads(entry.body)
+        
+        HTTP_CACHE_LOOKUPS_TOTAL.inc(source or "unknown", "miss")
+        if response.status != 200:
+            return None
+        
+        if ttl > 0:
+            await asyncio.to_thread(self.set, key, url, response.body, ttl,
+                                    etag=response.headers.get('ETag'),
+                                    last_modified=response.headers.get('Last-Modified'))
+        return json.loads(response.body)
+
+async def fetch_json(client: HttpClient, url: str, params: Dict = None, cache: HttpCache = None,
+                     source: str = None, limiter: AsyncRateLimiter = None) -> Optional[Any]:
+    """GET a JSON resource, going through the cache when one is configured"""
+    if cache:
+        return await cache.get_json(client, url, params, source=source, limiter=limiter)
+    
+    response = await client.get(url, params=params, limiter=limiter, source=source)
+    if response.status == 200:
+        return json.loads(response.body)
+    return None
@@ -0,0 +1,216 @@
+from config import (logger, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_DNS_CACHE_SECONDS, HTTP_TIMEOUT_SECONDS,
+                    HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE_SECONDS, HTTP_BACKOFF_MAX_SECONDS,
+                    CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_RESET_SECONDS)
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
+import aiohttp
+from monitoring.instruments import (HTTP_CLIENT_REQUEST_SECONDS, HTTP_CLIENT_RESPONSES_TOTAL, HTTP_CLIENT_RETRIES_TOTAL,
+                                    HTTP_CLIENT_CIRCUIT_REJECTIONS_TOTAL, UPSTREAM_QUOTA_UNITS_TOTAL)
+from .rate_limiter import AsyncRateLimiter
+
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open"""
+
+@dataclass
+class HttpResponse:
+    """A fully read upstream response"""
+    status: int
+    headers: Mapping[str, str]
+    body: bytes
+
+class CircuitBreaker:
+    """Fails fast for a host after repeated failures, then lets a single probe through once it has cooled down"""
+    
+    def __init__(self, host: str, threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_BREAKER_RESET_SECONDS):
+        self.host = host
+        self.threshold = max(1, threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.open_until = 0.0
+        self._probing = False
+    
+    @property
+    def state(self) -> str:
+        if self.failures < self.threshold and time.monotonic() >= self.open_until:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half-open"
+    
+    def before_request(self) -> bool:
+        """Raise CircuitOpenError unless a request may go out now; True if that request is the half-open probe"""
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(f"Circuit open for {self.host}, retrying in {self.open_until - time.monotonic():.0f}s")
+        if state == "half-open":
+            if self._probing:
+                raise CircuitOpenError(f"Circuit half-open for {self.host}, probe in flight")
+            self._probing = True
+            return True
+        return False
+    
+    def release_probe(self):
+        """Give up the probe slot of a request that ended without an outcome, e.g. when it was cancelled"""
+        self._probing = False
+    
+    def record_success(self):
+        if self.failures >= self.threshold:
+            logger.info(f"Circuit closed for {self.host}")
+        self.failures = 0
+        self.open_until = 0.0
+        self._probing = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.threshold:
+            self.trip(self.reset_seconds)
+    
+    def trip(self, seconds: float):
+        """Open the circuit for at least `seconds`"""
+        self.failures = max(self.failures, self.threshold)
+        self.open_until = max(self.open_until, time.monotonic() + seconds)
+        self._probing = False
+        logger.warning(f"Circuit open for {self.host} for {seconds:.0f}s")
+
+class HttpClient:
+    """Pooled HTTP transport shared by all collectors, with jittered retries and per-host circuit breakers"""
+    
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 dns_cache_seconds: int = HTTP_DNS_CACHE_SECONDS, timeout_seconds: float = HTTP_TIMEOUT_SECONDS,
+                 max_retries: int = HTTP_MAX_RETRIES, backoff_base: float = HTTP_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = HTTP_BACKOFF_MAX_SECONDS):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_seconds = dns_cache_seconds
+        self.timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        # Quota units charged per request, keyed by source; collectors register their upstream's costs
+        self.quota_costs: Dict[str, int] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Keep-alive session for the running event loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             ttl_dns_cache=self.dns_cache_seconds)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._loop = loop
+        return self._session
+    
+    async def close(self):
+        """Close the pooled connections"""
+        if self._session and not self._session.closed and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+    
+    def breaker_for(self, host: str) -> CircuitBreaker:
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(host)
+        return self.breakers[host]
+    
+    async def get(self, url: str, params: Dict = None, headers: Dict = None,
+                  limiter: AsyncRateLimiter = None, source: str = None) -> HttpResponse:
+        """GET a URL, retrying rate limits, 5xx and connection errors with jittered backoff"""
+        breaker = self.breaker_for(urlsplit(url).netloc)
+        source = source or "unknown"
+        
+        try:
+            probe = breaker.before_request()
+        except CircuitOpenError:
+            HTTP_CLIENT_CIRCUIT_REJECTIONS_TOTAL.inc(breaker.host)
+            raise
+        
+        try:
+            return await self._get_with_retries(breaker, url, params, headers, limiter, source)
+        except BaseException:
+            # Source deadlines cancel requests routinely; a probe cut off that way must not hold the slot forever
+            if probe:
+                breaker.release_probe()
+            raise
+    
+    async def _get_with_retries(self, breaker: CircuitBreaker, url: str, params: Dict, headers: Dict,
+                                limiter: AsyncRateLimiter, source: str) -> HttpResponse:
+        """Send the request once the breaker let it through, recording its outcome on the breaker"""
+        quota_cost = self.quota_costs.get(source)
+        
+        for attempt in range(self.max_retries + 1):
+            if attempt and breaker.state == "open":
+                # Another request tripped the breaker while this one was backing off
+                HTTP_CLIENT_CIRCUIT_REJECTIONS_TOTAL.inc(breaker.host)
+                raise CircuitOpenError(f"Circuit open for {breaker.host}")
+            if attempt:
+                HTTP_CLIENT_RETRIES_TOTAL.inc(source, breaker.host)
+            if limiter:
+                await limiter.acquire()
+            
+            start = time.perf_counter()
+            try:
+                async with self.session.get(url, params=params, headers=headers) as response:
+                    result = HttpResponse(response.status, response.headers, await response.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                HTTP_CLIENT_REQUEST_SECONDS.observe(time.perf_counter() - start, source, breaker.host)
+                HTTP_CLIENT_RESPONSES_TOTAL.inc(source, breaker.host, "error")
+                if attempt == self.max_retries:
+                    breaker.record_failure()
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"GET {breaker.host} failed ({e!r}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            HTTP_CLIENT_REQUEST_SECONDS.observe(time.perf_counter() - start, source, breaker.host)
+            HTTP_CLIENT_RESPONSES_TOTAL.inc(source, breaker.host, result.status)
+            if quota_cost:
+                # The API charges every request it answers, errors included, but not ones that never reached it
+                UPSTREAM_QUOTA_UNITS_TOTAL.inc(source, amount=quota_cost)
+            if result.status not in RETRY_STATUSES:
+                breaker.record_success()
+                return result
+            
+            retry_after = self._retry_after(result.headers)
+            if retry_after is not None and retry_after > self.backoff_max:
+                # The host asked for a longer pause than we are willing to wait; stop calling it until then
+                breaker.trip(retry_after)
+                return result
+            if attempt == self.max_retries:
+                breaker.record_failure()
+                return result
+            
+            delay = retry_after if retry_after is not None else self._backoff(attempt)
+            logger.warning(f"GET {breaker.host} returned {result.status}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        
+        return result
+    
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+    
+    @staticmethod
+    def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+        """Seconds to wait from a Retry-After header, given either as seconds or as an HTTP date"""
+        value = headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,22 @@
+import asyncio
+import time
+
+class AsyncRateLimiter:
+    """Spaces out async requests so that at most `rate` of them start per second"""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+    
+    async def acquire(self):
+        """Wait until the next request slot is free"""
+        if not self.interval:
+            return
+        
+        # No await between reading and booking the slot, so this is safe on a single event loop
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        
+        if slot > now:
+            await asyncio.sleep(slot - now)
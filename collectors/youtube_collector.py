@@ -1,80 +1,177 @@
-from config import logger
+from config import logger, YOUTUBE_MAX_CONCURRENCY, YOUTUBE_REQUESTS_PER_SECOND
 import asyncio
 from datetime import datetime
-from typing import Dict, List, Optional
-import aiohttp
-from schema import WorkflowMetrics
+from typing import Dict, Iterable, List, Optional
+from schema import WorkflowMetrics, YouTubeMetrics
+from monitoring.instruments import UPSTREAM_QUOTA_UNITS_TOTAL, YOUTUBE_QUOTA_UNITS_LAST_RUN
+from .http_cache import HttpCache, fetch_json
+from .http_client import HttpClient
+from .rate_limiter import AsyncRateLimiter
 
 class YouTubeCollector:
     """Collects n8n workflow data from YouTube"""
     
-    def __init__(self, api_key: str):
+    SEARCH_QUERIES = [
+        "n8n workflow automation",
+        "n8n tutorial workflow",
+        "n8n integration workflow",
+        "n8n slack automation",
+        "n8n google sheets workflow",
+        "n8n email automation",
+        "n8n webhook workflow",
+        "n8n database automation",
+        "n8n api integration",
+        "n8n zapier alternative"
+    ]
+    
+    # videos.list accepts at most 50 IDs per request
+    STATS_BATCH_SIZE = 50
+    
+    # Data API quota units per request, keyed by cache source: search.list costs 100, videos.list costs 1
+    QUOTA_COSTS = {'YouTube': 100, 'YouTubeStatistics': 1}
+    
+    def __init__(self, api_key: str, max_concurrency: int = YOUTUBE_MAX_CONCURRENCY,
+                 requests_per_second: float = YOUTUBE_REQUESTS_PER_SECOND, cache: HttpCache = None,
+                 http_client: HttpClient = None):
         self.api_key = api_key
+        self.cache = cache
+        self.http_client = http_client or HttpClient()
+        self.http_client.quota_costs.update(self.QUOTA_COSTS)
         self.base_url = "https://www.googleapis.com/youtube/v3"
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_second = requests_per_second
+        # Query -> video IDs from the last search run, kept for provenance
+        self.query_videos: Dict[str, List[str]] = {}
     
     async def search_n8n_workflows(self, country: str = "US") -> List[WorkflowMetrics]:
         """Search for n8n workflow videos on YouTube"""
-        workflows = []
-        
-        search_queries = [
-            "n8n workflow automation",
-            "n8n tutorial workflow",
-            "n8n integration workflow",
-            "n8n slack automation",
-            "n8n google sheets workflow",
-            "n8n email automation",
-            "n8n webhook workflow",
-            "n8n database automation",
-            "n8n api integration",
-            "n8n zapier alternative"
-        ]
-        
-        async with aiohttp.ClientSession() as session:
-            for query in search_queries:
-                try:
-                    # Search for videos
-                    search_url = f"{self.base_url}/search"
-                    search_params = {
-                        'key': self.api_key,
-                        'q': query,
-                        'part': 'snippet',
-                        'type': 'video',
-                        'maxResults': 25,
-                        'regionCode': country,
-                        'order': 'relevance'
-                    }
-                    
-                    async with session.get(search_url, params=search_params) as response:
-                        if response.status == 200:
-                            search_data = await response.json()
-                            video_ids = [item['id']['videoId'] for item in search_data.get('items', [])]
-                            
-                            if video_ids:
-                                # Get video statistics
-                                stats_url = f"{self.base_url}/videos"
-                                stats_params = {
-                                    'key': self.api_key,
-                                    'id': ','.join(video_ids),
-                                    'part': 'statistics,snippet'
-                                }
-                                
-                                async with session.get(stats_url, params=stats_params) as stats_response:
-                                    if stats_response.status == 200:
-                                        stats_data = await stats_response.json()
-                                        
-                                        for video in stats_data.get('items', []):
-                                            workflow = self._parse_video_data(video, country)
-                                            if workflow:
-                                                workflows.append(workflow)
-                        
-                        # Rate limiting
-                        await asyncio.sleep(0.1)
-                
-                except Exception as e:
-                    logger.error(f"Error fetching YouTube data for query '{query}': {e}")
+        results = await self.search_all_countries([country])
+        return results[country]
+    
+    async def search_all_countries(self, countries: List[str]) -> Dict[str, List[WorkflowMetrics]]:
+        """Search every (query, country) pair concurrently and fetch statistics once per unique video"""
+        # Created per run so they bind to the running event loop
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = AsyncRateLimiter(self.requests_per_second)
+        
+        pairs = [(query, country) for country in countries for query in self.SEARCH_QUERIES]
+        quota_before = self._quota_used()
+        
+        # Stage 1: discover video IDs for every query and country
+        id_lists = await asyncio.gather(*(
+            self._search_video_ids(semaphore, limiter, query, country)
+            for query, country in pairs
+        ))
+        
+        # Dicts keep first-seen order while deduplicating
+        query_videos: Dict[str, Dict[str, None]] = {query: {} for query in self.SEARCH_QUERIES}
+        country_videos: Dict[str, Dict[str, None]] = {country: {} for country in countries}
+        unique_ids = set()
+        
+        for (query, country), video_ids in zip(pairs, id_lists):
+            for video_id in video_ids:
+                query_videos[query][video_id] = None
+                country_videos[country][video_id] = None
+                unique_ids.add(video_id)
+        
+        # Stage 2: fetch statistics for each unique video in full batches
+        workflows = await self._collect_statistics(semaphore, limiter, country_videos)
+        
+        self.query_videos = {query: list(video_ids) for query, video_ids in query_videos.items()}
+        quota_spent = self._quota_used() - quota_before
+        YOUTUBE_QUOTA_UNITS_LAST_RUN.set(quota_spent)
+        logger.info(f"YouTube search found {len(unique_ids)} unique videos across {len(pairs)} queries "
+                    f"using {quota_spent:.0f} quota units")
         
         return workflows
     
+    async def refresh_statistics(self, video_ids_by_country: Dict[str, List[str]]) -> Dict[str, List[WorkflowMetrics]]:
+        """Re-poll statistics for already known videos without running any searches"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = AsyncRateLimiter(self.requests_per_second)
+        quota_before = self._quota_used()
+        workflows = await self._collect_statistics(semaphore, limiter, video_ids_by_country)
+        YOUTUBE_QUOTA_UNITS_LAST_RUN.set(self._quota_used() - quota_before)
+        return workflows
+    
+    def _quota_used(self) -> float:
+        """Quota units spent by this process so far; cache hits cost nothing"""
+        return sum(UPSTREAM_QUOTA_UNITS_TOTAL.value(source) for source in self.QUOTA_COSTS)
+    
+    async def _collect_statistics(self, semaphore: asyncio.Semaphore, limiter: AsyncRateLimiter,
+                                  video_ids_by_country: Dict[str, Iterable[str]]) -> Dict[str, List[WorkflowMetrics]]:
+        """Fetch statistics once per unique video in 50-ID batches and build per-country rows"""
+        unique_ids = sorted({video_id for video_ids in video_ids_by_country.values() for video_id in video_ids})
+        batches = [unique_ids[i:i + self.STATS_BATCH_SIZE] for i in range(0, len(unique_ids), self.STATS_BATCH_SIZE)]
+        batch_results = await asyncio.gather(*(
+            self._fetch_video_statistics(semaphore, limiter, batch)
+            for batch in batches
+        ))
+        
+        videos = {}
+        for batch_videos in batch_results:
+            videos.update(batch_videos)
+        
+        logger.info(f"Fetched YouTube statistics for {len(unique_ids)} videos in {len(batches)} batches")
+        
+        workflows = {country: [] for country in video_ids_by_country}
+        for country, video_ids in video_ids_by_country.items():
+            for video_id in video_ids:
+                if video_id in videos:
+                    workflow = self._parse_video_data(videos[video_id], country)
+                    if workflow:
+                        workflows[country].append(workflow)
+        
+        return workflows
+    
+    async def _search_video_ids(self, semaphore: asyncio.Semaphore, limiter: AsyncRateLimiter,
+                                query: str, country: str) -> List[str]:
+        """Run a single search query and return the video IDs it matched"""
+        search_url = f"{self.base_url}/search"
+        search_params = {
+            'key': self.api_key,
+            'q': query,
+            'part': 'snippet',
+            'type': 'video',
+            'maxResults': 25,
+            'regionCode': country,
+            'order': 'relevance'
+        }
+        
+        async with semaphore:
+            try:
+                search_data = await fetch_json(self.http_client, search_url, search_params,
+                                               cache=self.cache, source="YouTube", limiter=limiter)
+                if search_data:
+                    return [item['id']['videoId'] for item in search_data.get('items', [])]
+            
+            except Exception as e:
+                logger.error(f"Error fetching YouTube data for query '{query}' ({country}): {e}")
+        
+        return []
+    
+    async def _fetch_video_statistics(self, semaphore: asyncio.Semaphore, limiter: AsyncRateLimiter,
+                                      video_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch statistics and snippets for up to 50 videos in one request"""
+        stats_url = f"{self.base_url}/videos"
+        stats_params = {
+            'key': self.api_key,
+            'id': ','.join(video_ids),
+            'part': 'statistics,snippet'
+        }
+        
+        async with semaphore:
+            try:
+                stats_data = await fetch_json(self.http_client, stats_url, stats_params,
+                                              cache=self.cache, source="YouTubeStatistics", limiter=limiter)
+                if stats_data:
+                    return {video['id']: video for video in stats_data.get('items', [])}
+            
+            except Exception as e:
+                logger.error(f"Error fetching YouTube statistics for {len(video_ids)} videos: {e}")
+        
+        return {}
+    
     def _parse_video_data(self, video_data: Dict, country: str) -> Optional[WorkflowMetrics]:
         """Parse video data into WorkflowMetrics"""
         try:
@@ -98,15 +195,16 @@ class YouTubeCollector:
             return WorkflowMetrics(
                 workflow=title,
                 platform="YouTube",
-                popularity_metrics={
-                    "views": views,
-                    "likes": likes,
-                    "comments": comments,
-                    "like_to_view_ratio": round(like_to_view_ratio, 4),
-                    "comment_to_view_ratio": round(comment_to_view_ratio, 4)
-                },
+                popularity_metrics=YouTubeMetrics(
+                    views=views,
+                    likes=likes,
+                    comments=comments,
+                    like_to_view_ratio=round(like_to_view_ratio, 4),
+                    comment_to_view_ratio=round(comment_to_view_ratio, 4)
+                ),
                 country=country,
-                last_updated=datetime.now().isoformat()
+                last_updated=datetime.now().isoformat(),
+                source_id=video_data.get('id')
             )
         
         except Exception as e:
@@ -10,5 +10,80 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY', '')
 
+# Database settings
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/workflows.db')
+
 # Mode settings
-DEVELOPMENT_MODE = os.getenv('DEVELOPMENT_MODE', 'True').lower() in ('true', '1', 't')
\ No newline at end of file
+DEVELOPMENT_MODE = os.getenv('DEVELOPMENT_MODE', 'True').lower() in ('true', '1', 't')
+
+# YouTube collection settings
+YOUTUBE_MAX_CONCURRENCY = int(os.getenv('YOUTUBE_MAX_CONCURRENCY', '8'))
+YOUTUBE_REQUESTS_PER_SECOND = float(os.getenv('YOUTUBE_REQUESTS_PER_SECOND', '10'))
+
+# Forum collection settings
+FORUM_MAX_CONCURRENCY = int(os.getenv('FORUM_MAX_CONCURRENCY', '4'))
+FORUM_REQUESTS_PER_SECOND = float(os.getenv('FORUM_REQUESTS_PER_SECOND', '3'))
+FORUM_TOP_PERIODS = [p.strip() for p in os.getenv('FORUM_TOP_PERIODS', 'daily,weekly,monthly,yearly,all').split(',') if p.strip()]
+FORUM_CATEGORIES = [c.strip() for c in os.getenv('FORUM_CATEGORIES', 'questions,built-with-n8n').split(',') if c.strip()]
+FORUM_MAX_PAGES = int(os.getenv('FORUM_MAX_PAGES', '20'))
+FORUM_LATEST_MAX_PAGES = int(os.getenv('FORUM_LATEST_MAX_PAGES', '5'))
+FORUM_MIN_VIEWS = int(os.getenv('FORUM_MIN_VIEWS', '50'))
+FORUM_BATCH_SIZE = int(os.getenv('FORUM_BATCH_SIZE', '200'))
+# Topics re-polled per incremental refresh, one request each; 300 at 3 req/s leaves headroom in FORUM_TIMEOUT
+FORUM_REFRESH_MAX_TOPICS = int(os.getenv('FORUM_REFRESH_MAX_TOPICS', '300'))
+
+# Shared HTTP client settings
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '10'))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv('HTTP_DNS_CACHE_SECONDS', '300'))
+HTTP_TIMEOUT_SECONDS = float(os.getenv('HTTP_TIMEOUT_SECONDS', '30'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+HTTP_BACKOFF_BASE_SECONDS = float(os.getenv('HTTP_BACKOFF_BASE_SECONDS', '0.5'))
+HTTP_BACKOFF_MAX_SECONDS = float(os.getenv('HTTP_BACKOFF_MAX_SECONDS', '30'))
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_THRESHOLD', '5'))
+CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', '60'))
+
+# HTTP response cache settings (TTLs in seconds, keyed by source platform)
+HTTP_CACHE_PATH = os.getenv('HTTP_CACHE_PATH', 'data/http_cache.db')
+HTTP_CACHE_MAX_MB = float(os.getenv('HTTP_CACHE_MAX_MB', '50'))
+HTTP_CACHE_TTLS = {
+    'YouTube': int(os.getenv('HTTP_CACHE_TTL_YOUTUBE', '21600')),
+    'YouTubeStatistics': int(os.getenv('HTTP_CACHE_TTL_YOUTUBE_STATS', '1800')),
+    'Forum': int(os.getenv('HTTP_CACHE_TTL_FORUM', '1800')),
+    'Google': int(os.getenv('HTTP_CACHE_TTL_GOOGLE', '43200'))
+}
+
+# Google Trends collection settings
+TRENDS_REQUESTS_PER_SECOND = float(os.getenv('TRENDS_REQUESTS_PER_SECOND', '1'))
+
+# Per-source collection deadlines in seconds
+SOURCE_TIMEOUTS = {
+    'YouTube': float(os.getenv('YOUTUBE_TIMEOUT', '120')),
+    # Worst case with the defaults is 7 top feeds x 20 pages + 5 latest pages at 3 req/s, about 50s before retries
+    'Forum': float(os.getenv('FORUM_TIMEOUT', '120')),
+    'Google': float(os.getenv('GOOGLE_TRENDS_TIMEOUT', '180'))
+}
+
+# API response cache settings
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+
+# Metric history settings
+SNAPSHOT_RAW_RETENTION_DAYS = int(os.getenv('SNAPSHOT_RAW_RETENTION_DAYS', '14'))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv('SNAPSHOT_RETENTION_DAYS', '365'))
+
+# Incremental refresh re-polls statistics for known IDs between full discovery runs
+INCREMENTAL_REFRESH_MINUTES = int(os.getenv('INCREMENTAL_REFRESH_MINUTES', '60'))
+
+# Finished collection jobs kept for status lookups
+JOB_HISTORY_SIZE = int(os.getenv('JOB_HISTORY_SIZE', '50'))
+
+# Skip the startup collection when the stored data is newer than this many hours
+STARTUP_COLLECTION_MAX_AGE_HOURS = float(os.getenv('STARTUP_COLLECTION_MAX_AGE_HOURS', '24'))
+
+# Leader election: only the process holding the lease runs the scheduler and collections
+LEADER_LEASE_SECONDS = float(os.getenv('LEADER_LEASE_SECONDS', '30'))
+LEADER_HEARTBEAT_SECONDS = float(os.getenv('LEADER_HEARTBEAT_SECONDS', '10'))
+# Columnar export of the workflows table and its history, rewritten after each collection run
+EXPORT_DIR = os.getenv('EXPORT_DIR', 'data/export')
+EXPORT_FORMATS = [f.strip() for f in os.getenv('EXPORT_FORMATS', 'arrow,parquet').split(',') if f.strip()]
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '50000'))
@@ -1,3 +1,3 @@
-from .db_manager import DatabaseManager
+from .db_manager import DatabaseManager, LeaseLostError
 
-__all__ = ['DatabaseManager']
+__all__ = ['DatabaseManager', 'LeaseLostError']
@@ -1,90 +1,1032 @@
+import base64
 import json
+import re
 import sqlite3
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List
-from schema import WorkflowMetrics
-from config import logger
+from typing import Dict, Iterator, List, Optional, Tuple
+from schema import METRICS_BY_PLATFORM, CollectionJob, CollectionReport, WorkflowMetrics
+from monitoring.instruments import DB_QUERY_SECONDS, DB_ROWS_TOTAL
+from config import logger, DATABASE_PATH, SNAPSHOT_RAW_RETENTION_DAYS, SNAPSHOT_RETENTION_DAYS
+
+# Hot metrics promoted from the popularity_metrics JSON into typed columns
+METRIC_COLUMNS = {
+    'views': 'INTEGER',
+    'likes': 'INTEGER',
+    'comments': 'INTEGER',
+    'replies': 'INTEGER',
+    'posts_count': 'INTEGER',
+    'like_to_view_ratio': 'REAL',
+    'comment_to_view_ratio': 'REAL',
+    'engagement_score': 'REAL',
+    'average_interest': 'REAL',
+    'trend_change_percent': 'REAL',
+    'peak_interest': 'INTEGER',
+    'search_consistency': 'REAL'
+}
+
+# Column order of the metric values in each upserted row
+METRIC_NAMES = tuple(METRIC_COLUMNS)
+
+# Position of each of a platform's metrics among METRIC_NAMES, for platforms whose metrics are all promoted
+PROMOTED_METRIC_POSITIONS = {
+    platform: [(name, METRIC_NAMES.index(name)) for name in record_type._fields]
+    for platform, record_type in METRICS_BY_PLATFORM.items()
+    if set(record_type._fields) <= METRIC_COLUMNS.keys()
+}
+
+# The stored metrics JSON, or NULL when the metric columns already hold all of it
+UNPROMOTED_METRICS_SQL = f'''
+    CASE WHEN platform IN ({', '.join(f"'{platform}'" for platform in PROMOTED_METRIC_POSITIONS)})
+              AND json_remove(popularity_metrics, {', '.join(f"'$.{column}'" for column in METRIC_COLUMNS)}) = '{{}}'
+         THEN NULL ELSE popularity_metrics END
+'''
+
+# Metrics that workflows are commonly ranked by, each backed by an index
+RANKING_METRICS = [
+    'views',
+    'likes',
+    'comments',
+    'replies',
+    'like_to_view_ratio',
+    'engagement_score',
+    'average_interest'
+]
+
+# Metrics whose history is kept in workflow_snapshots
+SNAPSHOT_METRICS = [
+    'views',
+    'likes',
+    'comments',
+    'replies',
+    'average_interest'
+]
+
+UPSERT_WORKFLOW_SQL = f'''
+    INSERT INTO workflows
+    (workflow, platform, popularity_metrics, country, last_updated, source_id, {', '.join(METRIC_COLUMNS)})
+    VALUES (?, ?, ?, ?, ?, ?, {', '.join('?' for _ in METRIC_COLUMNS)})
+    ON CONFLICT(workflow, platform, country) DO UPDATE SET
+        popularity_metrics = excluded.popularity_metrics,
+        last_updated = excluded.last_updated,
+        source_id = COALESCE(excluded.source_id, source_id),
+        {', '.join(f'{column} = excluded.{column}' for column in METRIC_COLUMNS)}
+'''
+
+INSERT_SNAPSHOT_SQL = f'''
+    INSERT OR REPLACE INTO workflow_snapshots (workflow_id, captured_at, {', '.join(SNAPSHOT_METRICS)})
+    SELECT id, ?, {', '.join(SNAPSHOT_METRICS)}
+    FROM workflows
+    WHERE workflow = ? AND platform = ? AND country = ?
+'''
+
+# Words of a search query; everything else, including FTS5 operators, is ignored
+SEARCH_TERM_PATTERN = re.compile(r'\w+')
+
+# Tables in the columnar export, each read in one ordered pass
+EXPORT_QUERIES = {
+    'workflows': f'''
+        SELECT w.id, w.workflow, w.platform, w.country, w.last_updated, w.source_id, w.cluster_id,
+               r.score, r.rank, {', '.join(f'w.{column}' for column in METRIC_COLUMNS)}
+        FROM workflows w
+        LEFT JOIN workflow_rankings r ON r.workflow_id = w.id
+        ORDER BY w.id
+    ''',
+    'snapshots': f'''
+        SELECT workflow_id, captured_at, {', '.join(SNAPSHOT_METRICS)}
+        FROM workflow_snapshots
+        ORDER BY workflow_id, captured_at
+    '''
+}
+
+class LeaseLostError(RuntimeError):
+    """A write was refused because this process no longer holds the lease it was made under"""
 
 class DatabaseManager:
     """Manages SQLite database operations"""
     
-    def __init__(self, db_path: str = "data/workflows.db"):
+    def __init__(self, db_path: str = DATABASE_PATH):
         self.db_path = db_path
+        # One connection per thread, reused across calls
+        self._local = threading.local()
         self.init_database()
     
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        """Open a connection tuned for concurrent readers and batched writes"""
+        conn = sqlite3.connect(self.db_path, timeout=30, cached_statements=256, check_same_thread=check_same_thread)
+        # WAL lets API readers proceed while a collection is writing
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-16000')  # ~16 MB page cache
+        conn.execute('PRAGMA mmap_size=134217728')  # 128 MB
+        conn.execute('PRAGMA busy_timeout=30000')
+        return conn
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connection for the calling thread, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+    
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
     def init_database(self):
-        """Initialize database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS workflows (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                workflow TEXT NOT NULL,
-                platform TEXT NOT NULL,
-                popularity_metrics TEXT NOT NULL,
-                country TEXT NOT NULL,
-                last_updated TEXT NOT NULL,
-                UNIQUE(workflow, platform, country)
+        """Initialize database with required tables and apply pending migrations"""
+        with self.connection as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS workflows (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    workflow TEXT NOT NULL,
+                    platform TEXT NOT NULL,
+                    popularity_metrics TEXT NOT NULL,
+                    country TEXT NOT NULL,
+                    last_updated TEXT NOT NULL,
+                    UNIQUE(workflow, platform, country)
+                )
+            ''')
+        
+        self._migrate()
+    
+    def _migrate(self):
+        """Bring an existing database up to the current schema version in place"""
+        migrations = [
+            self._migrate_metric_columns,
+            self._migrate_ranking_indexes,
+            self._migrate_summary_table,
+            self._migrate_metadata_table,
+            self._migrate_snapshots_table,
+            self._migrate_rankings_table,
+            self._migrate_cluster_column,
+            self._migrate_source_id_column,
+            self._migrate_leases_table,
+            self._migrate_search_index,
+            self._migrate_jobs_table
+        ]
+        
+        conn = self.connection
+        # IMMEDIATE takes the write lock up front so concurrent processes migrate one at a time
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for target, migration in enumerate(migrations[version:], start=version + 1):
+                migration(conn)
+                conn.execute(f'PRAGMA user_version = {target}')
+                logger.info(f"Migrated database schema to version {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def _migrate_metric_columns(self, conn: sqlite3.Connection):
+        """v1: promote hot metrics to typed columns and index filters and rankings"""
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(workflows)')}
+        for column, column_type in METRIC_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f'ALTER TABLE workflows ADD COLUMN {column} {column_type}')
+        
+        # Backfill from the JSON blob
+        conn.execute(f'''
+            UPDATE workflows SET
+            {', '.join(f"{column} = json_extract(popularity_metrics, '$.{column}')" for column in METRIC_COLUMNS)}
+        ''')
+        
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_workflows_platform_country
+            ON workflows(platform COLLATE NOCASE, country COLLATE NOCASE)
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_workflows_country ON workflows(country COLLATE NOCASE)')
+        for metric in RANKING_METRICS:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_workflows_{metric} ON workflows({metric})')
+    
+    def _migrate_ranking_indexes(self, conn: sqlite3.Connection):
+        """v2: composite indexes so top-N within a platform and country reads only N rows"""
+        for metric in RANKING_METRICS:
+            conn.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_workflows_platform_country_{metric}
+                ON workflows(platform COLLATE NOCASE, country COLLATE NOCASE, {metric})
+            ''')
+    
+    def _migrate_summary_table(self, conn: sqlite3.Connection):
+        """v3: per-platform and per-country rollups kept in sync by save_workflows"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS workflow_summary (
+                dimension TEXT NOT NULL,
+                key TEXT NOT NULL,
+                workflow_count INTEGER NOT NULL,
+                total_views INTEGER,
+                avg_views REAL,
+                top_workflow TEXT,
+                top_metric TEXT,
+                top_value REAL,
+                last_updated TEXT,
+                PRIMARY KEY (dimension, key)
+            )
+        ''')
+        self._refresh_summary(conn)
+    
+    def refresh_summary(self):
+        """Recompute the rollups after a series of saves made without refreshing them"""
+        with DB_QUERY_SECONDS.time('refresh_summary'), self.connection as conn:
+            self._refresh_summary(conn)
+            self._bump_generation(conn)
+    
+    def _refresh_summary(self, conn: sqlite3.Connection):
+        """Recompute the rollups in the caller's transaction so they always match the workflows table"""
+        conn.execute('DELETE FROM workflow_summary')
+        for dimension in ('platform', 'country'):
+            # Forum and YouTube rank by views, Google Trends by average interest
+            conn.execute(f'''
+                INSERT INTO workflow_summary
+                (dimension, key, workflow_count, total_views, avg_views, top_workflow, top_metric, top_value, last_updated)
+                SELECT
+                    '{dimension}', totals.key, totals.workflow_count, totals.total_views, totals.avg_views,
+                    top.workflow, top.metric, top.value, totals.last_updated
+                FROM (
+                    SELECT {dimension} AS key, COUNT(*) AS workflow_count, SUM(views) AS total_views,
+                           AVG(views) AS avg_views, MAX(last_updated) AS last_updated
+                    FROM workflows
+                    GROUP BY {dimension}
+                ) AS totals
+                LEFT JOIN (
+                    SELECT {dimension} AS key, workflow,
+                           CASE WHEN views IS NOT NULL THEN 'views' ELSE 'average_interest' END AS metric,
+                           COALESCE(views, average_interest) AS value,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY {dimension} ORDER BY COALESCE(views, average_interest) DESC
+                           ) AS position
+                    FROM workflows
+                    WHERE COALESCE(views, average_interest) IS NOT NULL
+                ) AS top ON top.key = totals.key AND top.position = 1
+            ''')
+    
+    def _migrate_metadata_table(self, conn: sqlite3.Connection):
+        """v4: key/value metadata, starting with the data generation counter"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS metadata (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+        conn.execute("INSERT OR IGNORE INTO metadata (key, value) VALUES ('generation', '0')")
+    
+    def _migrate_snapshots_table(self, conn: sqlite3.Connection):
+        """v5: append-only metric history, seeded with the current values"""
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS workflow_snapshots (
+                workflow_id INTEGER NOT NULL,
+                captured_at INTEGER NOT NULL,
+                {', '.join(f'{metric} {METRIC_COLUMNS[metric]}' for metric in SNAPSHOT_METRICS)},
+                PRIMARY KEY (workflow_id, captured_at)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_captured_at ON workflow_snapshots(captured_at)')
+        conn.execute(f'''
+            INSERT OR IGNORE INTO workflow_snapshots (workflow_id, captured_at, {', '.join(SNAPSHOT_METRICS)})
+            -- last_updated is naive local time; 'utc' converts it so seeds share time.time()'s epoch clock
+            SELECT id, CAST(strftime('%s', last_updated, 'utc') AS INTEGER), {', '.join(SNAPSHOT_METRICS)}
+            FROM workflows
+        ''')
+    
+    def _migrate_rankings_table(self, conn: sqlite3.Connection):
+        """v6: precomputed cross-platform ranking index"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS workflow_rankings (
+                workflow_id INTEGER PRIMARY KEY,
+                score REAL NOT NULL,
+                rank INTEGER NOT NULL,
+                group_rank INTEGER NOT NULL,
+                computed_at TEXT NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_rankings_rank ON workflow_rankings(rank)')
+    
+    def _migrate_cluster_column(self, conn: sqlite3.Connection):
+        """v7: near-duplicate cluster assignment per workflow"""
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(workflows)')}
+        if 'cluster_id' not in existing:
+            conn.execute('ALTER TABLE workflows ADD COLUMN cluster_id INTEGER')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_workflows_cluster_id ON workflows(cluster_id)')
+    
+    def _migrate_source_id_column(self, conn: sqlite3.Connection):
+        """v8: upstream IDs so known items can be refreshed without rediscovering them"""
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(workflows)')}
+        if 'source_id' not in existing:
+            conn.execute('ALTER TABLE workflows ADD COLUMN source_id TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_workflows_platform_source_id ON workflows(platform, source_id)')
+    
+    def _migrate_leases_table(self, conn: sqlite3.Connection):
+        """v9: time-limited leases used to elect the one process that runs collections"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+    
+    def _migrate_search_index(self, conn: sqlite3.Connection):
+        """v10: FTS5 index over workflow titles, extended by save_workflows with each batch of new rows"""
+        # External content: the index stores only tokens and reads titles back from workflows
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS workflows_fts USING fts5(
+                workflow,
+                content='workflows',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
             )
         ''')
+        # New rows are indexed in bulk by _index_new_workflows; a per-row insert trigger is several times slower.
+        # Deletes and renames never happen in normal operation but are covered by triggers.
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS workflows_fts_delete AFTER DELETE ON workflows BEGIN
+                INSERT INTO workflows_fts (workflows_fts, rowid, workflow) VALUES ('delete', old.id, old.workflow);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS workflows_fts_update AFTER UPDATE OF workflow ON workflows BEGIN
+                INSERT INTO workflows_fts (workflows_fts, rowid, workflow) VALUES ('delete', old.id, old.workflow);
+                INSERT INTO workflows_fts (rowid, workflow) VALUES (new.id, new.workflow);
+            END
+        ''')
+        conn.execute("INSERT INTO workflows_fts (workflows_fts) VALUES ('rebuild')")
+        conn.execute('''
+            INSERT OR REPLACE INTO metadata (key, value)
+            SELECT 'search_indexed_id', COALESCE(MAX(id), 0) FROM workflows
+        ''')
+    
+    def _migrate_jobs_table(self, conn: sqlite3.Connection):
+        """v11: collection job records, so every worker can report on jobs the leader runs"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS collection_jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                requested_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                coalesced_requests INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                report TEXT,
+                served_by TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_collection_jobs_requested_at ON collection_jobs(requested_at)')
+        # A forwarded refresh used to be stored as its kind; turn it into a job the leader can adopt
+        conn.execute('''
+            INSERT INTO collection_jobs (job_id, kind, requested_at, status)
+            SELECT lower(hex(randomblob(16))), value, strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'), 'queued'
+            FROM metadata WHERE key = 'refresh_requested' AND value IN ('full', 'incremental')
+        ''')
+        conn.execute('''
+            UPDATE metadata SET value = (SELECT job_id FROM collection_jobs WHERE status = 'queued')
+            WHERE key = 'refresh_requested' AND value IN ('full', 'incremental')
+        ''')
+    
+    def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> Tuple[bool, str]:
+        """Take or renew a lease if it is free, expired or already ours; returns whether we hold it and who does"""
+        now = time.time()
+        with self.connection as conn:
+            conn.execute('''
+                INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+            ''', (name, holder, now + ttl_seconds, now))
+            current = conn.execute('SELECT holder FROM leases WHERE name = ?', (name,)).fetchone()[0]
+        return current == holder, current
+    
+    def holds_lease(self, name: str, holder: str) -> bool:
+        """Whether `holder` still holds an unexpired lease"""
+        return self._holds_lease(self.connection, name, holder)
+    
+    @staticmethod
+    def _holds_lease(conn: sqlite3.Connection, name: str, holder: str) -> bool:
+        row = conn.execute('SELECT 1 FROM leases WHERE name = ? AND holder = ? AND expires_at >= ?',
+                           (name, holder, time.time())).fetchone()
+        return row is not None
+    
+    def release_lease(self, name: str, holder: str):
+        """Give up a lease we hold so another process can take over without waiting for it to expire"""
+        with self.connection as conn:
+            conn.execute('DELETE FROM leases WHERE name = ? AND holder = ?', (name, holder))
+    
+    def request_refresh(self, job: CollectionJob) -> Tuple[str, bool]:
+        """Leave a refresh job for the leader, or join the one already waiting; returns its ID and whether it was joined
         
-        conn.commit()
-        conn.close()
+        A waiting full refresh is never narrowed to incremental.
+        """
+        conn = self.connection
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT value FROM metadata WHERE key = 'refresh_requested'").fetchone()
+            if row:
+                conn.execute('''
+                    UPDATE collection_jobs
+                    SET kind = CASE WHEN kind = 'full' THEN kind ELSE ? END,
+                        coalesced_requests = coalesced_requests + 1
+                    WHERE job_id = ?
+                ''', (job.kind, row[0]))
+                result = (row[0], True)
+            else:
+                self._save_job(conn, job)
+                conn.execute("INSERT INTO metadata (key, value) VALUES ('refresh_requested', ?)", (job.job_id,))
+                result = (job.job_id, False)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return result
+    
+    def pop_refresh_request(self) -> Optional[CollectionJob]:
+        """Take the refresh job waiting for the leader, if any"""
+        conn = self.connection
+        # Read and clear under the write lock so a request joining in between is not lost
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT value FROM metadata WHERE key = 'refresh_requested'").fetchone()
+            job = None
+            if row:
+                conn.execute("DELETE FROM metadata WHERE key = 'refresh_requested'")
+                job = self._get_job(conn, row[0])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return job
+    
+    def save_job(self, job: CollectionJob, served_by: str = None):
+        """Record a collection job's current state; `served_by` points a joined job at the run that covers it"""
+        with self.connection as conn:
+            self._save_job(conn, job, served_by)
+    
+    @staticmethod
+    def _save_job(conn: sqlite3.Connection, job: CollectionJob, served_by: str = None):
+        conn.execute('''
+            INSERT INTO collection_jobs
+            (job_id, kind, requested_at, status, started_at, finished_at, coalesced_requests, error, report, served_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+                kind = excluded.kind,
+                status = excluded.status,
+                started_at = excluded.started_at,
+                finished_at = excluded.finished_at,
+                coalesced_requests = excluded.coalesced_requests,
+                error = excluded.error,
+                report = excluded.report,
+                served_by = COALESCE(excluded.served_by, served_by)
+        ''', (job.job_id, job.kind, job.requested_at, job.status, job.started_at, job.finished_at,
+              job.coalesced_requests, job.error, json.dumps(job.report.to_dict()) if job.report else None, served_by))
+    
+    def get_job(self, job_id: str) -> Optional[CollectionJob]:
+        """Look up a collection job, following a joined job to the run that served it"""
+        return self._get_job(self.connection, job_id)
     
-    def save_workflows(self, workflows: List[WorkflowMetrics]):
-        """Save or update workflows in database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    @staticmethod
+    def _get_job(conn: sqlite3.Connection, job_id: str) -> Optional[CollectionJob]:
+        row = conn.execute('''
+            SELECT job_id, kind, requested_at, status, started_at, finished_at, coalesced_requests, error, report
+            FROM collection_jobs
+            WHERE job_id = (SELECT COALESCE(served_by, job_id) FROM collection_jobs WHERE job_id = ?)
+        ''', (job_id,)).fetchone()
+        if row is None:
+            return None
+        return CollectionJob(*row[:8], report=CollectionReport.from_dict(json.loads(row[8])) if row[8] else None)
+    
+    def fail_unfinished_jobs(self, error: str) -> int:
+        """Fail the queued and running jobs of a previous leader; a refresh still waiting for pickup is kept"""
+        with self.connection as conn:
+            return conn.execute('''
+                UPDATE collection_jobs SET status = 'failed', error = ?, finished_at = ?
+                WHERE status IN ('queued', 'running') AND served_by IS NULL
+                AND job_id NOT IN (SELECT value FROM metadata WHERE key = 'refresh_requested')
+            ''', (error, datetime.now().isoformat())).rowcount
+    
+    def prune_jobs(self, keep: int):
+        """Forget finished and joined jobs beyond the `keep` most recently requested ones"""
+        with self.connection as conn:
+            conn.execute('''
+                DELETE FROM collection_jobs
+                WHERE (status IN ('succeeded', 'failed') OR served_by IS NOT NULL)
+                AND job_id NOT IN (SELECT job_id FROM collection_jobs ORDER BY requested_at DESC LIMIT ?)
+            ''', (keep,))
+    
+    def _index_new_workflows(self, conn: sqlite3.Connection):
+        """Add rows inserted since the last save to the search index, in the caller's transaction
         
-        for workflow in workflows:
-            cursor.execute('''
-                INSERT OR REPLACE INTO workflows 
-                (workflow, platform, popularity_metrics, country, last_updated)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                workflow.workflow,
-                workflow.platform,
-                json.dumps(workflow.popularity_metrics),
-                workflow.country,
-                workflow.last_updated or datetime.now().isoformat()
-            ))
-        
-        conn.commit()
-        conn.close()
+        IDs are AUTOINCREMENT and never reused, so everything above the recorded high-water mark is new.
+        """
+        conn.execute('''
+            INSERT INTO workflows_fts (rowid, workflow)
+            SELECT id, workflow FROM workflows
+            WHERE id > (SELECT CAST(value AS INTEGER) FROM metadata WHERE key = 'search_indexed_id')
+        ''')
+        conn.execute('''
+            UPDATE metadata SET value = (SELECT COALESCE(MAX(id), 0) FROM workflows) WHERE key = 'search_indexed_id'
+        ''')
+    
+    def _bump_generation(self, conn: sqlite3.Connection):
+        """Advance the data generation in the caller's transaction so cached reads are invalidated"""
+        conn.execute("UPDATE metadata SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+    
+    def get_generation(self) -> int:
+        """Current data generation, incremented by every write to the workflows table"""
+        row = self.connection.execute("SELECT value FROM metadata WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+    
+    def get_last_updated(self) -> Optional[str]:
+        """Timestamp of the most recently collected workflow, read from the summary table"""
+        row = self.connection.execute(
+            "SELECT MAX(last_updated) FROM workflow_summary WHERE dimension = 'platform'"
+        ).fetchone()
+        return row[0] if row else None
+    
+    def save_workflows(self, workflows: List[WorkflowMetrics], lease: Tuple[str, str] = None,
+                       update_summary: bool = True):
+        """Save or update workflows in database in a single batched transaction
+        
+        With a (name, holder) lease, the write only goes ahead while that lease is held. The check runs
+        under the write lock, so no other process can take the lease over before the commit.
+        Rebuilding the summary scans the whole table, so callers saving many batches pass
+        update_summary=False and call refresh_summary() once at the end.
+        """
+        now = datetime.now().isoformat()
+        # One row per (workflow, platform, country); the last occurrence wins, as the upsert would
+        rows = [workflow.to_row(METRIC_NAMES, now) for workflow in {w.key: w for w in workflows}.values()]
+        
+        captured_at = int(time.time())
+        snapshot_keys = [(captured_at, row[0], row[1], row[3]) for row in rows]
+        
+        with DB_QUERY_SECONDS.time('save_workflows'), self.connection as conn:
+            if lease:
+                conn.execute('BEGIN IMMEDIATE')
+                if not self._holds_lease(conn, *lease):
+                    raise LeaseLostError(f"Lease '{lease[0]}' is no longer held by {lease[1]}")
+            conn.executemany(UPSERT_WORKFLOW_SQL, rows)
+            conn.executemany(INSERT_SNAPSHOT_SQL, snapshot_keys)
+            self._index_new_workflows(conn)
+            if update_summary:
+                self._refresh_summary(conn)
+            self._bump_generation(conn)
+        
+        DB_ROWS_TOTAL.inc('save_workflows', amount=len(rows))
         logger.info(f"Saved {len(workflows)} workflows to database")
     
+    def prune_snapshots(self, raw_retention_days: int = SNAPSHOT_RAW_RETENTION_DAYS,
+                        retention_days: int = SNAPSHOT_RETENTION_DAYS):
+        """Drop expired snapshots and downsample older ones to the last snapshot of each day"""
+        now = int(time.time())
+        retention_cutoff = now - retention_days * 86400
+        raw_cutoff = now - raw_retention_days * 86400
+        
+        with self.connection as conn:
+            expired = conn.execute('DELETE FROM workflow_snapshots WHERE captured_at < ?',
+                                   (retention_cutoff,)).rowcount
+            downsampled = conn.execute('''
+                DELETE FROM workflow_snapshots
+                WHERE captured_at < ?
+                AND (workflow_id, captured_at) NOT IN (
+                    SELECT workflow_id, MAX(captured_at)
+                    FROM workflow_snapshots
+                    WHERE captured_at < ?
+                    GROUP BY workflow_id, captured_at / 86400
+                )
+            ''', (raw_cutoff, raw_cutoff)).rowcount
+        
+        if expired or downsampled:
+            logger.info(f"Pruned {expired} expired and {downsampled} downsampled snapshots")
+    
+    def get_snapshot_series(self, metric: str, since: int, platform: str = None,
+                            country: str = None) -> List[Tuple[int, int, float]]:
+        """Fetch (workflow_id, captured_at, value) points since a unix timestamp, ordered per workflow"""
+        if metric not in SNAPSHOT_METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of: {', '.join(SNAPSHOT_METRICS)}")
+        
+        query = f'''
+            SELECT s.workflow_id, s.captured_at, s.{metric}
+            FROM workflow_snapshots AS s
+            JOIN workflows AS w ON w.id = s.workflow_id
+            WHERE s.captured_at >= ? AND s.{metric} IS NOT NULL
+        '''
+        params = [since]
+        if platform:
+            query += " AND w.platform = ? COLLATE NOCASE"
+            params.append(platform)
+        if country:
+            query += " AND w.country = ? COLLATE NOCASE"
+            params.append(country)
+        query += " ORDER BY s.workflow_id, s.captured_at"
+        
+        return self.connection.execute(query, params).fetchall()
+    
+    def get_scoring_inputs(self, metrics: List[str]) -> List[Tuple]:
+        """Fetch (id, platform, country, *metrics) for every workflow"""
+        unknown = [metric for metric in metrics if metric not in METRIC_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+        return self.connection.execute(
+            f"SELECT id, platform, country, {', '.join(metrics)} FROM workflows"
+        ).fetchall()
+    
+    def save_rankings(self, rankings: List[Tuple[int, float, int, int]]):
+        """Replace the ranking index with (workflow_id, score, rank, group_rank) rows"""
+        computed_at = datetime.now().isoformat()
+        with self.connection as conn:
+            conn.execute('DELETE FROM workflow_rankings')
+            conn.executemany('''
+                INSERT INTO workflow_rankings (workflow_id, score, rank, group_rank, computed_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(*ranking, computed_at) for ranking in rankings])
+            self._bump_generation(conn)
+        
+        logger.info(f"Saved rankings for {len(rankings)} workflows")
+    
+    def get_top_workflows(self, platform: str = None, country: str = None, limit: int = 20) -> List[Dict]:
+        """Read the highest ranked workflows straight from the ranking index"""
+        query = '''
+            SELECT w.workflow, w.platform, w.popularity_metrics, w.country, w.last_updated,
+                   r.score, r.rank, r.group_rank
+            FROM workflow_rankings AS r
+            JOIN workflows AS w ON w.id = r.workflow_id
+        '''
+        params = []
+        conditions = []
+        if platform:
+            conditions.append("w.platform = ? COLLATE NOCASE")
+            params.append(platform)
+        if country:
+            conditions.append("w.country = ? COLLATE NOCASE")
+            params.append(country)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY r.rank LIMIT ?"
+        params.append(limit)
+        
+        return [
+            {
+                'workflow': row[0],
+                'platform': row[1],
+                'popularity_metrics': json.loads(row[2]),
+                'country': row[3],
+                'last_updated': row[4],
+                'score': row[5],
+                'rank': row[6],
+                'group_rank': row[7]
+            }
+            for row in self.connection.execute(query, params).fetchall()
+        ]
+    
+    def get_source_ids(self, platform: str, limit: int = None) -> Dict[str, List[str]]:
+        """Known upstream IDs for a platform, grouped by country; with `limit`, only that many of the most viewed"""
+        source_ids: Dict[str, List[str]] = {}
+        query = 'SELECT country, source_id FROM workflows WHERE platform = ? AND source_id IS NOT NULL'
+        params: List = [platform]
+        if limit is not None:
+            query += ' ORDER BY views IS NULL, views DESC, id LIMIT ?'
+            params.append(limit)
+        else:
+            query += ' ORDER BY id'
+        rows = self.connection.execute(query, params).fetchall()
+        for country, source_id in rows:
+            source_ids.setdefault(country, []).append(source_id)
+        return source_ids
+    
+    def get_titles(self) -> List[Tuple[int, str]]:
+        """Fetch (id, workflow) for every workflow"""
+        return self.connection.execute('SELECT id, workflow FROM workflows').fetchall()
+    
+    def save_clusters(self, cluster_ids: Dict[int, int]):
+        """Store cluster assignments given as {workflow_id: cluster_id}"""
+        with self.connection as conn:
+            conn.executemany('UPDATE workflows SET cluster_id = ? WHERE id = ?',
+                             [(cluster_id, workflow_id) for workflow_id, cluster_id in cluster_ids.items()])
+            self._bump_generation(conn)
+        
+        logger.info(f"Assigned {len(cluster_ids)} workflows to {len(set(cluster_ids.values()))} clusters")
+    
+    def get_clusters(self, platform: str = None, country: str = None, min_size: int = 1,
+                     limit: int = 20) -> List[Dict]:
+        """Aggregate popularity per cluster of near-duplicate workflows, best ranked clusters first"""
+        conditions = ["w.cluster_id IS NOT NULL"]
+        params = []
+        if platform:
+            conditions.append("w.platform = ? COLLATE NOCASE")
+            params.append(platform)
+        if country:
+            conditions.append("w.country = ? COLLATE NOCASE")
+            params.append(country)
+        
+        query = f'''
+            WITH members AS (
+                SELECT w.cluster_id, w.workflow, w.platform, w.country, w.views, w.likes,
+                       w.average_interest, r.score,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY w.cluster_id ORDER BY COALESCE(r.score, 0) DESC, w.id
+                       ) AS position
+                FROM workflows AS w
+                LEFT JOIN workflow_rankings AS r ON r.workflow_id = w.id
+                WHERE {' AND '.join(conditions)}
+            )
+            SELECT cluster_id,
+                   MAX(CASE WHEN position = 1 THEN workflow END) AS title,
+                   COUNT(*) AS size,
+                   GROUP_CONCAT(DISTINCT platform) AS platforms,
+                   GROUP_CONCAT(DISTINCT country) AS countries,
+                   SUM(views) AS total_views,
+                   SUM(likes) AS total_likes,
+                   MAX(average_interest) AS max_average_interest,
+                   MAX(score) AS best_score
+            FROM members
+            GROUP BY cluster_id
+            HAVING COUNT(*) >= ?
+            ORDER BY best_score DESC, total_views DESC
+            LIMIT ?
+        '''
+        params.extend([min_size, limit])
+        
+        return [
+            {
+                'cluster_id': row[0],
+                'title': row[1],
+                'size': row[2],
+                'platforms': row[3].split(',') if row[3] else [],
+                'countries': row[4].split(',') if row[4] else [],
+                'total_views': row[5],
+                'total_likes': row[6],
+                'max_average_interest': row[7],
+                'best_score': row[8]
+            }
+            for row in self.connection.execute(query, params).fetchall()
+        ]
+    
+    def get_workflows_by_ids(self, workflow_ids: List[int]) -> Dict[int, Dict]:
+        """Look up workflows by row id"""
+        if not workflow_ids:
+            return {}
+        
+        placeholders = ', '.join('?' for _ in workflow_ids)
+        rows = self.connection.execute(f'''
+            SELECT id, workflow, platform, popularity_metrics, country, last_updated
+            FROM workflows WHERE id IN ({placeholders})
+        ''', list(workflow_ids)).fetchall()
+        
+        return {
+            row[0]: {
+                'workflow': row[1],
+                'platform': row[2],
+                'popularity_metrics': json.loads(row[3]),
+                'country': row[4],
+                'last_updated': row[5]
+            }
+            for row in rows
+        }
+    
+    def get_workflow_stats(self) -> Dict:
+        """Read collection statistics from the precomputed summary table"""
+        with DB_QUERY_SECONDS.time('get_workflow_stats'):
+            rows = self.connection.execute('''
+                SELECT dimension, key, workflow_count, total_views, avg_views,
+                       top_workflow, top_metric, top_value, last_updated
+                FROM workflow_summary
+            ''').fetchall()
+        
+        stats = {
+            'total_workflows': 0,
+            'by_platform': {},
+            'by_country': {},
+            'last_updated': None,
+            'platforms': {}
+        }
+        
+        for dimension, key, count, total_views, avg_views, top_workflow, top_metric, top_value, last_updated in rows:
+            if dimension == 'country':
+                stats['by_country'][key] = count
+                continue
+            
+            stats['total_workflows'] += count
+            stats['by_platform'][key] = count
+            stats['last_updated'] = max(filter(None, [stats['last_updated'], last_updated]), default=None)
+            stats['platforms'][key] = {
+                'workflow_count': count,
+                'total_views': total_views,
+                'avg_views': round(avg_views, 2) if avg_views is not None else None,
+                'top_workflow': {
+                    'workflow': top_workflow,
+                    'metric': top_metric,
+                    'value': top_value
+                } if top_workflow else None,
+                'last_updated': last_updated
+            }
+        
+        return stats
+    
     def get_workflows(self, platform: str = None, country: str = None) -> List[Dict]:
         """Retrieve workflows from database with optional filters"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        workflows, _ = self.get_workflows_page(platform, country)
+        return workflows
+    
+    def get_workflows_page(self, platform: str = None, country: str = None, sort_by: str = None,
+                           order: str = None, limit: int = None,
+                           cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """Retrieve one page of workflows, sorted and paginated inside SQLite
         
-        query = "SELECT * FROM workflows"
-        params = []
+        Sorting by a metric skips rows that don't report it. Returns the page and an opaque
+        cursor for the next page, or None when there are no more rows.
+        """
+        query, params = self._build_workflows_query(platform, country, sort_by, order, cursor, with_metrics=True)
+        
+        if limit is not None:
+            # One extra row tells us whether there is a next page
+            query += " LIMIT ?"
+            params.append(limit + 1)
         
-        if platform or country:
-            query += " WHERE "
-            conditions = []
-            if platform:
-                conditions.append("LOWER(platform) = LOWER(?)")
-                params.append(platform)
-            if country:
-                conditions.append("LOWER(country) = LOWER(?)")
-                params.append(country)
-            query += " AND ".join(conditions)
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+        with DB_QUERY_SECONDS.time('get_workflows_page'):
+            rows = self.connection.execute(query, params).fetchall()
+        
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1][6], rows[-1][0])
         
         results = []
         for row in rows:
             results.append({
                 'workflow': row[1],
                 'platform': row[2],
-                'popularity_metrics': json.loads(row[3]),
+                'popularity_metrics': self._metrics_from_row(row[2], row[3], row[7:]),
                 'country': row[4],
                 'last_updated': row[5]
             })
         
-        return results
\ No newline at end of file
+        DB_ROWS_TOTAL.inc('get_workflows_page', amount=len(results))
+        return results, next_cursor
+    
+    def search_workflows(self, query: str, platform: str = None, country: str = None,
+                         limit: int = 20) -> List[Dict]:
+        """Full-text search over workflow titles, best BM25 match first
+        
+        Every word of the query must appear in the title. The last word also matches as a prefix,
+        so partially typed queries already find results.
+        """
+        terms = SEARCH_TERM_PATTERN.findall(query)
+        if not terms:
+            raise ValueError("Search query must contain at least one word")
+        # Quoted terms keep user input from being parsed as FTS5 syntax
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        
+        sql = '''
+            SELECT w.workflow, w.platform, w.popularity_metrics, w.country, w.last_updated, workflows_fts.rank
+            FROM workflows_fts
+            JOIN workflows w ON w.id = workflows_fts.rowid
+            WHERE workflows_fts MATCH ?
+        '''
+        params = [match]
+        if platform:
+            sql += " AND w.platform = ? COLLATE NOCASE"
+            params.append(platform)
+        if country:
+            sql += " AND w.country = ? COLLATE NOCASE"
+            params.append(country)
+        sql += " ORDER BY workflows_fts.rank LIMIT ?"
+        params.append(limit)
+        
+        with DB_QUERY_SECONDS.time('search_workflows'):
+            rows = self.connection.execute(sql, params).fetchall()
+        
+        DB_ROWS_TOTAL.inc('search_workflows', amount=len(rows))
+        return [
+            {
+                'workflow': row[0],
+                'platform': row[1],
+                'popularity_metrics': json.loads(row[2]),
+                'country': row[3],
+                'last_updated': row[4],
+                # bm25() is lower for better matches; flip it so higher means more relevant
+                'relevance': round(-row[5], 4)
+            }
+            for row in rows
+        ]
+    
+    def iter_workflow_rows(self, platform: str = None, country: str = None, sort_by: str = None,
+                           order: str = None, batch_size: int = 500) -> Iterator[List[Tuple]]:
+        """Stream matching rows in batches from a server-side cursor
+        
+        Yields lists of (workflow, platform, popularity_metrics_json, country, last_updated)
+        tuples, leaving popularity_metrics as stored JSON text so it never has to be decoded.
+        """
+        query, params = self._build_workflows_query(platform, country, sort_by, order)
+        
+        # Streaming consumers may resume the generator on different threads, so use a dedicated connection
+        conn = self._connect(check_same_thread=False)
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                DB_ROWS_TOTAL.inc('iter_workflow_rows', amount=len(rows))
+                yield [row[1:6] for row in rows]
+        finally:
+            conn.close()
+    
+    def iter_export_batches(self, batch_size: int = 50_000) -> Iterator[Tuple[str, List[str], List[Tuple]]]:
+        """Stream every exported table as (table, column names, rows) batches
+        
+        All tables are read in one transaction, so the history always matches the workflows it refers to.
+        """
+        conn = self._connect(check_same_thread=False)
+        try:
+            conn.execute('BEGIN')
+            for table, query in EXPORT_QUERIES.items():
+                cursor = conn.execute(query)
+                columns = [description[0] for description in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    DB_ROWS_TOTAL.inc('iter_export_batches', amount=len(rows))
+                    yield table, columns, rows
+        finally:
+            conn.rollback()
+            conn.close()
+    
+    @staticmethod
+    def _metrics_from_row(platform: str, metrics_json: Optional[str], values: Tuple) -> Dict:
+        """Build popularity_metrics from the typed metric columns, decoding JSON only for metrics without one"""
+        if metrics_json is not None:
+            return json.loads(metrics_json)
+        return {name: values[position] for name, position in PROMOTED_METRIC_POSITIONS[platform]}
+    
+    def _build_workflows_query(self, platform: str = None, country: str = None, sort_by: str = None,
+                               order: str = None, cursor: str = None,
+                               with_metrics: bool = False) -> Tuple[str, List]:
+        """Build the filtered, ordered workflows query shared by paging and streaming
+        
+        Without an explicit order, metric sorts are descending and unsorted queries keep insertion order.
+        With metrics, the metrics JSON is only selected for rows the metric columns can't rebuild
+        (see UNPROMOTED_METRICS_SQL), and every metric column follows the sort column.
+        """
+        if order is None:
+            order = "desc" if sort_by else "asc"
+        if sort_by is not None and sort_by not in METRIC_COLUMNS:
+            raise ValueError(f"Unknown sort_by '{sort_by}', expected one of: {', '.join(METRIC_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Unknown order '{order}', expected 'asc' or 'desc'")
+        
+        sort_column = sort_by or "id"
+        if with_metrics:
+            query = (f"SELECT id, workflow, platform, {UNPROMOTED_METRICS_SQL}, country, last_updated, {sort_column}, "
+                     f"{', '.join(METRIC_NAMES)} FROM workflows")
+        else:
+            query = f"SELECT id, workflow, platform, popularity_metrics, country, last_updated, {sort_column} FROM workflows"
+        params = []
+        conditions = []
+        
+        if platform:
+            conditions.append("platform = ? COLLATE NOCASE")
+            params.append(platform)
+        if country:
+            conditions.append("country = ? COLLATE NOCASE")
+            params.append(country)
+        if sort_by:
+            conditions.append(f"{sort_by} IS NOT NULL")
+        
+        # Keyset pagination: continue strictly after the last row of the previous page
+        comparison = "<" if order == "desc" else ">"
+        if cursor:
+            last_value, last_id = self._decode_cursor(cursor)
+            if sort_by:
+                conditions.append(f"({sort_by}, id) {comparison} (?, ?)")
+                params.extend([last_value, last_id])
+            else:
+                conditions.append(f"id {comparison} ?")
+                params.append(last_id)
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        direction = order.upper()
+        query += f" ORDER BY {sort_by} {direction}, id {direction}" if sort_by else f" ORDER BY id {direction}"
+        
+        return query, params
+    
+    @staticmethod
+    def _encode_cursor(sort_value, row_id: int) -> str:
+        return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[object, int]:
+        try:
+            sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return sort_value, int(row_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
@@ -0,0 +1,6 @@
+from .metrics import Counter, Gauge, Histogram, Registry, REGISTRY, CONTENT_TYPE
+from .middleware import MetricsMiddleware
+from . import instruments
+
+__all__ = ['Counter', 'Gauge', 'Histogram', 'Registry', 'REGISTRY', 'CONTENT_TYPE', 'MetricsMiddleware',
+           'instruments']
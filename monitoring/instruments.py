@@ -0,0 +1,43 @@
+from .metrics import Counter, Gauge, Histogram
+
+# Upstream HTTP, labelled by collector source and host
+HTTP_CLIENT_REQUEST_SECONDS = Histogram(
+    'http_client_request_duration_seconds', 'Latency of upstream HTTP requests, per attempt', ['source', 'host'])
+HTTP_CLIENT_RESPONSES_TOTAL = Counter(
+    'http_client_responses_total', 'Upstream HTTP responses by status; "error" for connection failures',
+    ['source', 'host', 'status'])
+HTTP_CLIENT_RETRIES_TOTAL = Counter(
+    'http_client_retries_total', 'Upstream HTTP requests retried after a 429, 5xx or connection error',
+    ['source', 'host'])
+HTTP_CLIENT_CIRCUIT_REJECTIONS_TOTAL = Counter(
+    'http_client_circuit_rejections_total', 'Upstream requests failed fast by an open circuit breaker', ['host'])
+HTTP_CACHE_LOOKUPS_TOTAL = Counter(
+    'http_cache_lookups_total', 'Upstream response cache lookups by result (hit, revalidated or miss)',
+    ['source', 'result'])
+
+# Quota
+UPSTREAM_QUOTA_UNITS_TOTAL = Counter(
+    'upstream_quota_units_total', 'API quota units spent on upstream requests', ['source'])
+YOUTUBE_QUOTA_UNITS_LAST_RUN = Gauge(
+    'youtube_quota_units_last_run', 'YouTube Data API quota units spent by the most recent YouTube run')
+
+# Database
+DB_QUERY_SECONDS = Histogram(
+    'db_query_duration_seconds', 'Duration of database operations', ['operation'])
+DB_ROWS_TOTAL = Counter(
+    'db_rows_total', 'Workflow rows written or read by database operations', ['operation'])
+
+# API
+HTTP_SERVER_REQUEST_SECONDS = Histogram(
+    'http_server_request_duration_seconds', 'Latency of API requests, until the response body is sent',
+    ['method', 'route', 'status'])
+
+# Collection
+COLLECTION_SOURCE_SECONDS = Histogram(
+    'collection_source_duration_seconds', 'Duration of collecting and saving one source', ['source', 'status'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+COLLECTION_ROWS_TOTAL = Counter(
+    'collection_rows_total', 'Workflows collected and saved per source', ['source'])
+COLLECTION_LAST_SUCCESS_TIMESTAMP = Gauge(
+    'collection_last_success_timestamp_seconds', 'Unix time of the last successful collection per source',
+    ['source'])
@@ -1,22 +1,29 @@
-import asyncio
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from config import logger
-from services import collector_service
+from apscheduler.triggers.interval import IntervalTrigger
+from config import logger, INCREMENTAL_REFRESH_MINUTES
+from services import job_manager
 
-# Background scheduler for automated collection
-def scheduled_collection():
+# Scheduled runs go through the job manager on the app's event loop, so they never overlap manual refreshes
+async def scheduled_collection():
     """Function to be called by scheduler"""
-    if collector_service:
-        try:
-            asyncio.run(collector_service.collect_all_workflows())
-            logger.info("Scheduled workflow collection completed")
-        except Exception as e:
-            logger.error(f"Scheduled collection failed: {e}")
+    job = await job_manager.run('full')
+    if job.status == "succeeded":
+        logger.info("Scheduled workflow collection completed")
+    else:
+        logger.error(f"Scheduled collection failed: {job.error}")
 
-def setup_scheduler():
-    """Setup background scheduler for automated data collection"""
-    scheduler = BackgroundScheduler()
+async def scheduled_incremental_refresh():
+    """Re-poll statistics for known workflows between full collections"""
+    job = await job_manager.run('incremental')
+    if job.status == "succeeded":
+        logger.info("Scheduled incremental refresh completed")
+    else:
+        logger.error(f"Scheduled incremental refresh failed: {job.error}")
+
+def setup_scheduler() -> AsyncIOScheduler:
+    """Setup and start the scheduler for automated data collection; call from within the running event loop"""
+    scheduler = AsyncIOScheduler()
     
     # Run daily at 2 AM
     scheduler.add_job(
@@ -27,5 +34,16 @@ def setup_scheduler():
         replace_existing=True
     )
     
+    # Refresh statistics for known IDs in between
+    if INCREMENTAL_REFRESH_MINUTES > 0:
+        scheduler.add_job(
+            func=scheduled_incremental_refresh,
+            trigger=IntervalTrigger(minutes=INCREMENTAL_REFRESH_MINUTES),
+            id='incremental_workflow_refresh',
+            name='Incremental N8N Workflow Refresh',
+            replace_existing=True
+        )
+    
     scheduler.start()
-    logger.info("Scheduler started - daily collection at 2 AM")
\ No newline at end of file
+    logger.info(f"Scheduler started - daily collection at 2 AM, incremental refresh every {INCREMENTAL_REFRESH_MINUTES} minutes")
+    return scheduler
\ No newline at end of file
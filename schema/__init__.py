@@ -1,3 +1,5 @@
-from .data_schema import WorkflowMetrics
+from .data_schema import (WorkflowMetrics, YouTubeMetrics, ForumMetrics, TrendsMetrics, METRICS_BY_PLATFORM,
+                          SourceReport, CollectionReport, CollectionJob)
 
-__all__ = ["WorkflowMetrics"]
\ No newline at end of file
+__all__ = ["WorkflowMetrics", "YouTubeMetrics", "ForumMetrics", "TrendsMetrics", "METRICS_BY_PLATFORM",
+           "SourceReport", "CollectionReport", "CollectionJob"]
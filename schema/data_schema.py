@@ -1,14 +1,206 @@
-from dataclasses import dataclass, asdict
-from typing import Dict
+from dataclasses import dataclass, asdict, field
+from typing import Callable, Dict, NamedTuple, Optional, Tuple, Union
+import json
+import math
+from operator import itemgetter
+
+class YouTubeMetrics(NamedTuple):
+    """Popularity metrics of a YouTube video"""
+    views: int
+    likes: int
+    comments: int
+    like_to_view_ratio: float
+    comment_to_view_ratio: float
+
+class ForumMetrics(NamedTuple):
+    """Popularity metrics of a community forum topic"""
+    views: int
+    likes: int
+    replies: int
+    posts_count: int
+    engagement_score: float
+
+class TrendsMetrics(NamedTuple):
+    """Search interest of a Google Trends keyword"""
+    average_interest: float
+    trend_change_percent: float
+    peak_interest: int
+    search_consistency: float
+
+MetricsRecord = Union[YouTubeMetrics, ForumMetrics, TrendsMetrics]
+
+METRICS_BY_PLATFORM = {
+    'YouTube': YouTubeMetrics,
+    'Forum': ForumMetrics,
+    'Google': TrendsMetrics
+}
+
+# Per record type (and column order), built on first use
+_PROJECTIONS: Dict[Tuple[type, Tuple[str, ...]], Callable[[tuple], tuple]] = {}
+_JSON_TEMPLATES: Dict[type, str] = {}
+
+def _json_value(value) -> str:
+    """JSON text of a metric value; numbers are formatted exactly as json.dumps does"""
+    if value is None:
+        return 'null'
+    if type(value) is int:
+        return str(value)
+    if type(value) is float and math.isfinite(value):
+        return repr(value)
+    return json.dumps(value)
 
-@dataclass
 class WorkflowMetrics:
-    """Data class for workflow popularity metrics"""
-    workflow: str
-    platform: str
-    popularity_metrics: Dict
-    country: str
-    last_updated: str = None
+    """Popularity metrics for one workflow on one platform and country
+    
+    Slotted to keep per-row memory low; metrics are held in the platform's typed record.
+    Equal workflows share the (workflow, platform, country) key, which is also the hash.
+    """
+    
+    __slots__ = ('workflow', 'platform', 'metrics', 'country', 'last_updated', 'source_id')
+    
+    def __init__(self, workflow: str, platform: str, popularity_metrics: Union[MetricsRecord, Dict], country: str,
+                 last_updated: str = None, source_id: str = None):
+        self.workflow = workflow
+        self.platform = platform
+        self.metrics = self._as_record(platform, popularity_metrics)
+        self.country = country
+        self.last_updated = last_updated
+        self.source_id = source_id  # Upstream ID (video ID, topic ID or keyword) used for incremental refreshes
+    
+    @staticmethod
+    def _as_record(platform: str, metrics: Union[MetricsRecord, Dict]):
+        """Accept a typed record as is, and convert a plain dict for known platforms
+        
+        A dict with metrics the record has no field for stays a dict, so none of its values are lost.
+        """
+        record_type = METRICS_BY_PLATFORM.get(platform)
+        if record_type is None or not isinstance(metrics, dict) or not metrics.keys() <= set(record_type._fields):
+            return metrics
+        return record_type(**{name: metrics.get(name) for name in record_type._fields})
+    
+    @property
+    def popularity_metrics(self) -> Dict:
+        """Metrics as a plain dict, for callers that predate the typed records"""
+        return self.metrics._asdict() if hasattr(self.metrics, '_asdict') else dict(self.metrics)
+    
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return (self.workflow, self.platform, self.country)
+    
+    def __hash__(self):
+        return hash((self.workflow, self.platform, self.country))
+    
+    def __eq__(self, other):
+        if not isinstance(other, WorkflowMetrics):
+            return NotImplemented
+        return (self.workflow, self.platform, self.country, self.metrics, self.last_updated, self.source_id) == \
+            (other.workflow, other.platform, other.country, other.metrics, other.last_updated, other.source_id)
+    
+    def __repr__(self):
+        return (f"WorkflowMetrics(workflow={self.workflow!r}, platform={self.platform!r}, metrics={self.metrics!r}, "
+                f"country={self.country!r}, last_updated={self.last_updated!r}, source_id={self.source_id!r})")
+    
+    def metric_values(self, columns: Tuple[str, ...]) -> Tuple:
+        """Values of the given metric names, None where this platform does not report one"""
+        metrics = self.metrics
+        if isinstance(metrics, dict):
+            return tuple(metrics.get(column) for column in columns)
+        
+        projection = _PROJECTIONS.get((type(metrics), columns))
+        if projection is None:
+            # Missing metrics point one past the record, at the None appended below
+            fields = metrics._fields
+            positions = [fields.index(column) if column in fields else len(fields) for column in columns]
+            projection = _PROJECTIONS[(type(metrics), columns)] = itemgetter(*positions)
+        values = projection(metrics + (None,))
+        return values if len(columns) != 1 else (values,)
+    
+    def metrics_json(self) -> str:
+        """Metrics as JSON text, formatted from a per-record-type template instead of an intermediate dict"""
+        metrics = self.metrics
+        if isinstance(metrics, dict):
+            return json.dumps(metrics)
+        
+        template = _JSON_TEMPLATES.get(type(metrics))
+        if template is None:
+            template = _JSON_TEMPLATES[type(metrics)] = \
+                '{' + ', '.join(f'{json.dumps(name)}: %s' for name in metrics._fields) + '}'
+        return template % tuple(map(_json_value, metrics))
+    
+    def to_row(self, metric_columns: Tuple[str, ...], default_last_updated: str = None) -> Tuple:
+        """Database row: workflow, platform, metrics JSON, country, last_updated, source_id, then metric columns"""
+        return (self.workflow, self.platform, self.metrics_json(), self.country,
+                self.last_updated or default_last_updated, self.source_id, *self.metric_values(metric_columns))
+    
+    def to_dict(self):
+        return {
+            'workflow': self.workflow,
+            'platform': self.platform,
+            'popularity_metrics': self.popularity_metrics,
+            'country': self.country,
+            'last_updated': self.last_updated,
+            'source_id': self.source_id
+        }
+
+@dataclass
+class SourceReport:
+    """Outcome of collecting a single source"""
+    source: str
+    status: str = "pending"  # pending, success, failed or timeout
+    count: int = 0
+    duration_seconds: float = 0.0
+    error: Optional[str] = None
+
+@dataclass
+class CollectionReport:
+    """Outcome of a full collection run across all sources"""
+    started_at: str
+    finished_at: str = None
+    duration_seconds: float = 0.0
+    sources: Dict[str, SourceReport] = field(default_factory=dict)
+    
+    @property
+    def total_count(self) -> int:
+        return sum(source.count for source in self.sources.values())
+    
+    def to_dict(self):
+        report = asdict(self)
+        report['total_count'] = self.total_count
+        return report
+    
+    @classmethod
+    def from_dict(cls, report: Dict) -> 'CollectionReport':
+        """Rebuild a report from its to_dict() form"""
+        return cls(
+            started_at=report['started_at'],
+            finished_at=report.get('finished_at'),
+            duration_seconds=report.get('duration_seconds', 0.0),
+            sources={name: SourceReport(**source) for name, source in report.get('sources', {}).items()}
+        )
+
+@dataclass
+class CollectionJob:
+    """A collection run tracked by the job manager, shared by every request coalesced into it"""
+    job_id: str
+    kind: str  # full or incremental
+    requested_at: str
+    status: str = "queued"  # queued, running, succeeded or failed
+    started_at: str = None
+    finished_at: str = None
+    coalesced_requests: int = 0
+    error: Optional[str] = None
+    report: Optional[CollectionReport] = None
+    
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
     
     def to_dict(self):
-        return asdict(self)
\ No newline at end of file
+        sources = self.report.sources.values() if self.report else []
+        job = asdict(self)
+        job['report'] = self.report.to_dict() if self.report else None
+        job['progress'] = {
+            'completed_sources': sum(1 for source in sources if source.status != "pending"),
+            'total_sources': len(sources)
+        }
+        return job
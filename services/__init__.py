@@ -1,4 +1,7 @@
 from .workflow_service import WorkflowCollectorService
-from .collector_service import collector_service
+from .job_manager import JobManager
+from .leader_election import LeaderElector
+from .collector_service import collector_service, job_manager, leader_elector
 
-__all__ = ['WorkflowCollectorService', 'collector_service']
\ No newline at end of file
+__all__ = ['WorkflowCollectorService', 'JobManager', 'LeaderElector', 'collector_service', 'job_manager',
+           'leader_elector']
\ No newline at end of file
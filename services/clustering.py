@@ -0,0 +1,85 @@
+import re
+import zlib
+import numpy as np
+from typing import Dict, List, Tuple
+
+# 32 bands of 4 rows put the LSH candidate threshold at a Jaccard similarity of about 0.42
+NUM_PERMUTATIONS = 128
+BANDS = 32
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+# Candidate pairs must also agree on this share of the signature before they are merged
+SIMILARITY_THRESHOLD = 0.5
+
+# Smallest prime above 2**32, so hashed shingles fit below it
+_PRIME = np.uint64(4294967311)
+_random = np.random.RandomState(42)
+_A = _random.randint(1, 2**31 - 1, size=NUM_PERMUTATIONS).astype(np.uint64)
+_B = _random.randint(0, 2**31 - 1, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+STOPWORDS = {
+    'n8n', 'a', 'an', 'and', 'the', 'to', 'of', 'for', 'in', 'on', 'with', 'how', 'your', 'you',
+    'i', 'my', 'is', 'this', 'using', 'use', 'it', 'by', 'from', 'de', 'que'
+}
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_HASHTAG_PATTERN = re.compile(r"#\w+")
+
+def normalize_title(title: str) -> List[str]:
+    """Lowercase a title and reduce it to meaningful word tokens"""
+    title = _HASHTAG_PATTERN.sub(" ", title.lower())
+    return [token for token in _TOKEN_PATTERN.findall(title) if token not in STOPWORDS]
+
+def shingles(title: str) -> set:
+    """Word unigrams and bigrams of the normalized title"""
+    tokens = normalize_title(title)
+    return set(tokens) | {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+
+def minhash_signature(title: str) -> np.ndarray:
+    """MinHash signature of a title's shingles"""
+    hashes = np.array([zlib.crc32(shingle.encode()) for shingle in shingles(title)], dtype=np.uint64)
+    if not len(hashes):
+        return np.full(NUM_PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+    # One row per permutation, one column per shingle
+    permuted = (np.outer(_A, hashes) + _B[:, None]) % _PRIME
+    return permuted.min(axis=1)
+
+def cluster_titles(items: List[Tuple[int, str]]) -> Dict[int, int]:
+    """Group near-duplicate titles and map each id to its cluster id
+    
+    The cluster id is the smallest member id. LSH banding keeps the work close to linear
+    in the number of titles instead of comparing every pair.
+    """
+    if not items:
+        return {}
+    
+    ids = [item_id for item_id, _ in items]
+    signatures = np.vstack([minhash_signature(title) for _, title in items])
+    empty = np.array([not shingles(title) for _, title in items])
+    
+    parent = list(range(len(items)))
+    
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+    
+    for band in range(BANDS):
+        band_slice = signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        buckets: Dict[bytes, int] = {}
+        for index in range(len(items)):
+            if empty[index]:
+                continue
+            key = band_slice[index].tobytes()
+            first = buckets.setdefault(key, index)
+            if first == index:
+                continue
+            root_first, root_index = find(first), find(index)
+            if root_first != root_index and np.mean(signatures[first] == signatures[index]) >= SIMILARITY_THRESHOLD:
+                parent[root_index] = root_first
+    
+    cluster_ids: Dict[int, int] = {}
+    for index in range(len(items)):
+        root = find(index)
+        cluster_ids[root] = min(cluster_ids.get(root, ids[index]), ids[index])
+    return {ids[index]: cluster_ids[find(index)] for index in range(len(items))}
@@ -1,5 +1,13 @@
-from services import WorkflowCollectorService
+from services.workflow_service import WorkflowCollectorService
+from services.job_manager import JobManager
+from services.leader_election import LeaderElector
 from config import YOUTUBE_API_KEY
 
 # Initialize collector service
-collector_service = WorkflowCollectorService(YOUTUBE_API_KEY)
\ No newline at end of file
+collector_service = WorkflowCollectorService(YOUTUBE_API_KEY)
+
+# Single-flight runner for every collection, manual or scheduled
+job_manager = JobManager(collector_service)
+
+# Decides which process runs the scheduler when several workers share the database
+leader_elector = LeaderElector(collector_service)
\ No newline at end of file
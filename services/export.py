@@ -0,0 +1,137 @@
+from config import logger, EXPORT_DIR, EXPORT_FORMATS, EXPORT_BATCH_SIZE
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+from database import DatabaseManager
+from database.db_manager import METRIC_COLUMNS, SNAPSHOT_METRICS
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, the export is skipped without it
+    pa = None
+
+MEDIA_TYPES = {
+    'arrow': 'application/vnd.apache.arrow.file',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+EXPORT_TABLES = ('workflows', 'snapshots')
+
+def _metric_type(metric: str):
+    return pa.int64() if METRIC_COLUMNS[metric] == 'INTEGER' else pa.float64()
+
+def export_schemas() -> Dict[str, 'pa.Schema']:
+    """Arrow schema of each exported table, in the column order of EXPORT_QUERIES"""
+    return {
+        'workflows': pa.schema([
+            ('id', pa.int64()),
+            ('workflow', pa.string()),
+            ('platform', pa.string()),
+            ('country', pa.string()),
+            ('last_updated', pa.timestamp('us')),
+            ('source_id', pa.string()),
+            ('cluster_id', pa.int64()),
+            ('score', pa.float64()),
+            ('rank', pa.int64()),
+            *((column, _metric_type(column)) for column in METRIC_COLUMNS)
+        ]),
+        'snapshots': pa.schema([
+            ('workflow_id', pa.int64()),
+            ('captured_at', pa.timestamp('s')),
+            *((metric, _metric_type(metric)) for metric in SNAPSHOT_METRICS)
+        ])
+    }
+
+class ColumnarExporter:
+    """Writes the workflows table and its metric history to memory-mappable Arrow and Parquet files"""
+    
+    def __init__(self, db_manager: DatabaseManager, directory: str = EXPORT_DIR, formats: List[str] = None,
+                 batch_size: int = EXPORT_BATCH_SIZE):
+        self.db_manager = db_manager
+        self.directory = directory
+        self.formats = [fmt for fmt in (formats if formats is not None else EXPORT_FORMATS) if fmt in MEDIA_TYPES]
+        self.batch_size = batch_size
+        # Collections and first-time downloads may both trigger an export
+        self._lock = threading.Lock()
+    
+    @property
+    def available(self) -> bool:
+        return pa is not None
+    
+    def path_for(self, table: str, fmt: str) -> str:
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Unknown table '{table}', expected one of: {', '.join(EXPORT_TABLES)}")
+        if fmt not in MEDIA_TYPES:
+            raise ValueError(f"Unknown format '{fmt}', expected one of: {', '.join(MEDIA_TYPES)}")
+        return os.path.join(self.directory, f"{table}.{fmt}")
+    
+    def export(self) -> Dict[str, int]:
+        """Rewrite every export file from one consistent read of the database; returns rows per table
+        
+        Files are written next to their destination and swapped in with os.replace, so readers that
+        have the previous export memory-mapped keep a valid file.
+        """
+        if not self.available:
+            logger.warning("⚠️ pyarrow is not installed, skipping columnar export")
+            return {}
+        
+        with self._lock:
+            start = time.perf_counter()
+            os.makedirs(self.directory, exist_ok=True)
+            schemas = export_schemas()
+            counts = dict.fromkeys(schemas, 0)
+            writers: Dict[Tuple[str, str], Tuple[str, object]] = {}
+            
+            try:
+                for table, schema in schemas.items():
+                    for fmt in self.formats:
+                        temp_path = f"{self.path_for(table, fmt)}.{os.getpid()}.tmp"
+                        writers[(table, fmt)] = (temp_path, self._open_writer(temp_path, fmt, schema))
+                
+                for table, _, rows in self.db_manager.iter_export_batches(self.batch_size):
+                    batch = self._record_batch(schemas[table], rows)
+                    for fmt in self.formats:
+                        writers[(table, fmt)][1].write_batch(batch)
+                    counts[table] += len(rows)
+                
+                # Every file must be complete before any of them replaces the previous export
+                for temp_path, writer in writers.values():
+                    writer.close()
+            except Exception:
+                for temp_path, writer in writers.values():
+                    try:
+                        writer.close()
+                    except Exception:
+                        pass  # Already closed, or the close itself failed; the file is discarded either way
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                raise
+            
+            for (table, fmt), (temp_path, _) in writers.items():
+                os.replace(temp_path, self.path_for(table, fmt))
+        
+        logger.info(f"📦 Exported {counts['workflows']} workflows and {counts['snapshots']} snapshots "
+                    f"as {', '.join(self.formats)} in {time.perf_counter() - start:.3f}s")
+        return counts
+    
+    @staticmethod
+    def _open_writer(path: str, fmt: str, schema: 'pa.Schema'):
+        if fmt == 'parquet':
+            return pq.ParquetWriter(path, schema)
+        # Uncompressed Arrow IPC file, readable zero-copy through pa.memory_map
+        return pa.ipc.new_file(path, schema)
+    
+    @staticmethod
+    def _record_batch(schema: 'pa.Schema', rows: List[Tuple]) -> 'pa.RecordBatch':
+        """Turn row tuples into typed columns; SQLite timestamps arrive as ISO text or epoch seconds"""
+        arrays = []
+        for field, values in zip(schema, zip(*rows)):
+            if pa.types.is_timestamp(field.type):
+                stored_type = pa.int64() if field.type.unit == 's' else pa.string()
+                arrays.append(pa.array(values, type=stored_type).cast(field.type))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
@@ -0,0 +1,204 @@
+from config import logger, JOB_HISTORY_SIZE
+from schema import CollectionJob, CollectionReport
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import uuid4
+import asyncio
+import copy
+
+class JobManager:
+    """Runs at most one collection at a time and coalesces concurrent requests into it
+    
+    Every state change is also recorded in the shared database, so any worker can report on a job.
+    """
+    
+    # Which kinds of run satisfy a request for a given kind
+    COVERS = {
+        'full': {'full'},
+        'incremental': {'full', 'incremental'}
+    }
+    
+    def __init__(self, service, max_history: int = JOB_HISTORY_SIZE):
+        self.service = service
+        self.max_history = max(1, max_history)
+        self.jobs = OrderedDict()
+        self._current: Optional[CollectionJob] = None
+        self._pending: Optional[CollectionJob] = None
+        self._finished = {}
+        self._task: Optional[asyncio.Task] = None
+        self._cancel_reason: Optional[str] = None
+        # Job snapshots waiting to be written, in order, by the _write_records task
+        self._records: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+    
+    def submit(self, kind: str = 'full') -> Tuple[CollectionJob, bool]:
+        """Start a collection of `kind`, or join the in-flight or queued one; returns the job and whether it was coalesced"""
+        self.check_kind(kind)
+        
+        # Joining is synchronous, so concurrent requests on the event loop can never start two runs
+        job = self._covering(kind)
+        if job:
+            job.coalesced_requests += 1
+            self._record(job)
+            logger.info(f"🔗 Refresh request coalesced into {job.kind} job {job.job_id}")
+            return job, True
+        
+        job = CollectionJob(job_id=uuid4().hex, kind=kind, requested_at=datetime.now().isoformat())
+        self._enqueue(job)
+        return job, False
+    
+    def adopt(self, job: CollectionJob) -> CollectionJob:
+        """Take over a refresh job a follower left in the database; returns the job that will serve it"""
+        covering = self._covering(job.kind)
+        if covering:
+            # The follower's clients keep polling their job ID, which now resolves to the covering run
+            covering.coalesced_requests += job.coalesced_requests + 1
+            self._record(covering)
+            self._record(job, served_by=covering.job_id)
+            logger.info(f"🔗 Forwarded refresh {job.job_id} coalesced into {covering.kind} job {covering.job_id}")
+            return covering
+        
+        self._enqueue(job)
+        return job
+    
+    def _covering(self, kind: str) -> Optional[CollectionJob]:
+        """The in-flight or queued job whose run satisfies a request for `kind`, if any"""
+        for job in (self._current, self._pending):
+            if job and job.kind in self.COVERS[kind]:
+                return job
+        return None
+    
+    def _enqueue(self, job: CollectionJob):
+        """Start a new job, or queue it behind the narrower run in flight"""
+        self._remember(job)
+        self._finished[job.job_id] = asyncio.Event()
+        self._record(job)
+        
+        if self._current:
+            # A narrower run is in flight; queue this one right behind it
+            self._pending = job
+        else:
+            self._start(job)
+    
+    @classmethod
+    def check_kind(cls, kind: str):
+        """Reject unknown collection kinds"""
+        if kind not in cls.COVERS:
+            raise ValueError(f"Invalid refresh kind '{kind}', expected one of: {', '.join(cls.COVERS)}")
+    
+    async def run(self, kind: str = 'full') -> CollectionJob:
+        """Submit a collection and wait for the job serving it to finish"""
+        job, _ = self.submit(kind)
+        finished = self._finished.get(job.job_id)
+        if finished:
+            await finished.wait()
+        return job
+    
+    async def cancel(self, reason: str):
+        """Drop the queued job and cancel the running one, returning once it has unwound"""
+        if self._pending:
+            pending, self._pending = self._pending, None
+            pending.status = "failed"
+            pending.error = reason
+            pending.finished_at = datetime.now().isoformat()
+            self._record(pending)
+            self._finished.pop(pending.job_id).set()
+        
+        task = self._task
+        if task and not task.done():
+            self._cancel_reason = reason
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    def get(self, job_id: str) -> Optional[CollectionJob]:
+        """Look up a job this process knows by ID"""
+        return self.jobs.get(job_id)
+    
+    async def find(self, job_id: str) -> Optional[CollectionJob]:
+        """Look up a job by ID, live from this process if it runs it, otherwise as last recorded by the leader"""
+        job = self.get(job_id)
+        if job:
+            return job
+        return await asyncio.to_thread(self.service.db_manager.get_job, job_id)
+    
+    async def fail_orphaned_jobs(self):
+        """Mark jobs left queued or running by a previous leader as failed; call on becoming leader"""
+        try:
+            failed = await asyncio.to_thread(self.service.db_manager.fail_unfinished_jobs,
+                                             "Leader process stopped before the job finished")
+        except Exception as e:
+            logger.error(f"❌ Failed to clean up jobs of a previous leader: {e}")
+            return
+        if failed:
+            logger.warning(f"⚠️ Marked {failed} collection jobs of a previous leader as failed")
+    
+    async def flush(self):
+        """Wait until every job state change so far is recorded in the database"""
+        if self._records:
+            await self._records.join()
+    
+    def _record(self, job: CollectionJob, served_by: str = None):
+        """Queue a snapshot of the job for the database; writes happen in order, off the event loop"""
+        if self._writer is None or self._writer.done():
+            self._records = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_records())
+        self._records.put_nowait((copy.deepcopy(job), served_by))
+    
+    async def _write_records(self):
+        db_manager = self.service.db_manager
+        while True:
+            job, served_by = await self._records.get()
+            try:
+                await asyncio.to_thread(db_manager.save_job, job, served_by)
+                if job.done:
+                    await asyncio.to_thread(db_manager.prune_jobs, self.max_history)
+            except Exception as e:
+                logger.error(f"❌ Failed to record collection job {job.job_id}: {e}")
+            finally:
+                self._records.task_done()
+    
+    def _remember(self, job: CollectionJob):
+        """Record a job, forgetting the oldest finished ones beyond the history size"""
+        self.jobs[job.job_id] = job
+        for job_id in [job_id for job_id, old in self.jobs.items() if old.done][:max(0, len(self.jobs) - self.max_history)]:
+            del self.jobs[job_id]
+    
+    def _start(self, job: CollectionJob):
+        """Launch a job on the running event loop"""
+        self._current = job
+        self._task = asyncio.create_task(self._execute(job))
+    
+    async def _execute(self, job: CollectionJob):
+        """Run the collection for a job and record its outcome"""
+        job.status = "running"
+        job.started_at = datetime.now().isoformat()
+        job.report = CollectionReport(started_at=job.started_at)
+        collect = self.service.collect_all_workflows if job.kind == 'full' else self.service.refresh_known_workflows
+        self._record(job)
+        logger.info(f"🚀 Started {job.kind} collection job {job.job_id}")
+        
+        try:
+            await collect(job.report)
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = self._cancel_reason or "Cancelled"
+            logger.warning(f"🛑 Collection job {job.job_id} cancelled: {job.error}")
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"❌ Collection job {job.job_id} failed: {e}")
+        finally:
+            job.finished_at = datetime.now().isoformat()
+            self._record(job)
+            self._finished.pop(job.job_id).set()
+            self._current = None
+            self._cancel_reason = None
+            if self._pending:
+                pending, self._pending = self._pending, None
+                self._start(pending)
@@ -0,0 +1,88 @@
+from config import logger, LEADER_LEASE_SECONDS, LEADER_HEARTBEAT_SECONDS
+from schema import CollectionJob
+from datetime import datetime
+from typing import Awaitable, Callable, Optional, Tuple
+from uuid import uuid4
+import asyncio
+import os
+import socket
+
+class LeaderElector:
+    """Elects one process to run the scheduler and collections through a lease row in the shared database"""
+    
+    LEASE_NAME = 'collector'
+    
+    def __init__(self, service, lease_seconds: float = LEADER_LEASE_SECONDS,
+                 heartbeat_seconds: float = LEADER_HEARTBEAT_SECONDS):
+        self.service = service
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.is_leader = False
+        self.leader_id: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    async def start(self, on_elected: Callable[[], Awaitable[None]], on_demoted: Callable[[], Awaitable[None]],
+                    on_refresh_requested: Callable[[CollectionJob], object]):
+        """Run the first election right away, then keep heartbeating in the background"""
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._on_refresh_requested = on_refresh_requested
+        # Collections save under this lease, so writes stop as soon as another process holds it
+        self.service.lease = (self.LEASE_NAME, self.holder_id)
+        await self._heartbeat()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop heartbeating and hand the lease back"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.is_leader:
+            await self._set_leader(False)
+            await asyncio.to_thread(self.service.db_manager.release_lease, self.LEASE_NAME, self.holder_id)
+    
+    def request_refresh(self, kind: str) -> Tuple[str, bool]:
+        """Queue a refresh job for whichever process is the leader; returns its ID and whether it joined a waiting one"""
+        job = CollectionJob(job_id=uuid4().hex, kind=kind, requested_at=datetime.now().isoformat())
+        return self.service.db_manager.request_refresh(job)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            await self._heartbeat()
+    
+    async def _heartbeat(self):
+        """Take or renew the lease, switch roles if that changed, and pick up forwarded refresh requests"""
+        db_manager = self.service.db_manager
+        try:
+            is_leader, self.leader_id = await asyncio.to_thread(
+                db_manager.acquire_lease, self.LEASE_NAME, self.holder_id, self.lease_seconds
+            )
+        except Exception as e:
+            # Without a renewed lease another process may take over, so stop acting as leader
+            logger.error(f"❌ Leader lease heartbeat failed: {e}")
+            is_leader = False
+        
+        if is_leader != self.is_leader:
+            await self._set_leader(is_leader)
+        
+        if self.is_leader:
+            try:
+                job = await asyncio.to_thread(db_manager.pop_refresh_request)
+                if job:
+                    self._on_refresh_requested(job)
+            except Exception as e:
+                logger.error(f"❌ Forwarded refresh request failed: {e}")
+    
+    async def _set_leader(self, is_leader: bool):
+        self.is_leader = is_leader
+        if is_leader:
+            logger.info(f"👑 {self.holder_id} elected leader, running scheduler and collections")
+            await self._on_elected()
+        else:
+            logger.info(f"👥 {self.holder_id} is a follower, serving reads only")
+            await self._on_demoted()
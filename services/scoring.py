@@ -0,0 +1,76 @@
+import numpy as np
+from typing import List, Tuple
+
+# Per-platform metric weights. Each metric is turned into a percentile within its
+# platform/country group, so the weighted sum is comparable across platforms.
+SCORING_WEIGHTS = {
+    'YouTube': {
+        'views': 0.5,
+        'likes': 0.2,
+        'comments': 0.1,
+        'like_to_view_ratio': 0.2
+    },
+    'Forum': {
+        'views': 0.4,
+        'likes': 0.2,
+        'replies': 0.2,
+        'engagement_score': 0.2
+    },
+    'Google': {
+        'average_interest': 0.7,
+        'trend_change_percent': 0.3
+    }
+}
+
+SCORING_METRICS = sorted({metric for weights in SCORING_WEIGHTS.values() for metric in weights})
+
+def percentile_ranks(values: np.ndarray) -> np.ndarray:
+    """Fraction of the group at or below each value, with missing values ranked lowest"""
+    present = ~np.isnan(values)
+    ranks = np.zeros(len(values), dtype=np.float64)
+    if present.any():
+        sorted_values = np.sort(values[present])
+        ranks[present] = np.searchsorted(sorted_values, values[present], side='right') / len(values)
+    return ranks
+
+def score_workflows(rows: List[Tuple]) -> List[Tuple[int, float, int, int]]:
+    """Score workflows on a unified 0-100 scale and rank them
+    
+    Rows are (id, platform, country, *SCORING_METRICS). Returns (id, score, rank,
+    group_rank) tuples, where group_rank is the position within its platform and country.
+    """
+    if not rows:
+        return []
+    
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    groups = np.array([f"{row[1]}\x00{row[2]}" for row in rows])
+    platforms = np.array([row[1] for row in rows])
+    metrics = np.array([row[3:] for row in rows], dtype=np.float64)  # None becomes NaN
+    scores = np.zeros(len(rows), dtype=np.float64)
+    
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group)
+        weights = SCORING_WEIGHTS.get(platforms[members[0]], {})
+        total_weight = sum(weights.values())
+        if not total_weight:
+            continue
+        
+        for metric, weight in weights.items():
+            column = SCORING_METRICS.index(metric)
+            scores[members] += percentile_ranks(metrics[members, column]) * weight
+        scores[members] *= 100 / total_weight
+    
+    # Overall rank by score, ties broken by id for a stable order
+    order = np.lexsort((ids, -scores))
+    ranks = np.empty(len(rows), dtype=np.int64)
+    ranks[order] = np.arange(1, len(rows) + 1)
+    
+    group_ranks = np.empty(len(rows), dtype=np.int64)
+    for group in np.unique(groups):
+        members = order[groups[order] == group]
+        group_ranks[members] = np.arange(1, len(members) + 1)
+    
+    return [
+        (int(ids[i]), round(float(scores[i]), 4), int(ranks[i]), int(group_ranks[i]))
+        for i in range(len(rows))
+    ]
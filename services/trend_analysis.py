@@ -0,0 +1,91 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+SECONDS_PER_DAY = 86400
+
+def compute_trends(points: List[Tuple[int, int, float]], moving_average_window: int = 3) -> Dict[str, np.ndarray]:
+    """Compute per-workflow deltas, growth rates and velocities from snapshot points
+    
+    Points are (workflow_id, captured_at, value) tuples sorted by workflow and time. Every
+    output array holds one entry per workflow.
+    """
+    if not points:
+        empty = np.array([], dtype=np.float64)
+        return {
+            'workflow_id': np.array([], dtype=np.int64),
+            'snapshots': np.array([], dtype=np.int64),
+            'first_value': empty,
+            'last_value': empty,
+            'delta': empty,
+            'growth_rate_percent': empty,
+            'velocity_per_day': empty,
+            'moving_average_velocity': empty
+        }
+    
+    data = np.asarray(points, dtype=np.float64)
+    ids = data[:, 0].astype(np.int64)
+    times = data[:, 1]
+    values = data[:, 2]
+    
+    # Series boundaries: index of the first and last point of each workflow
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    ends = np.r_[starts[1:], len(ids)] - 1
+    
+    first_values = values[starts]
+    last_values = values[ends]
+    delta = last_values - first_values
+    elapsed_days = (times[ends] - times[starts]) / SECONDS_PER_DAY
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        velocity = np.where(elapsed_days > 0, delta / elapsed_days, 0.0)
+        growth_rate = np.where(first_values > 0, delta / first_values * 100, 0.0)
+    
+    # Per-day rate between consecutive snapshots. Interval i joins point i and i + 1, so the
+    # intervals of a workflow are [start, end) and never cross into a neighbouring series.
+    interval_rates = np.diff(values) / np.maximum(np.diff(times), 1) * SECONDS_PER_DAY
+    cumulative = np.concatenate(([0.0], np.cumsum(interval_rates)))
+    window_starts = np.maximum(ends - moving_average_window, starts)
+    window_sizes = ends - window_starts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moving_average = np.where(
+            window_sizes > 0,
+            (cumulative[ends] - cumulative[window_starts]) / np.maximum(window_sizes, 1),
+            0.0
+        )
+    
+    return {
+        'workflow_id': ids[starts],
+        'snapshots': ends - starts + 1,
+        'first_value': first_values,
+        'last_value': last_values,
+        'delta': delta,
+        'growth_rate_percent': growth_rate,
+        'velocity_per_day': velocity,
+        'moving_average_velocity': moving_average
+    }
+
+def rank_trending(points: List[Tuple[int, int, float]], limit: int = 20,
+                  moving_average_window: int = 3) -> List[Dict]:
+    """Rank workflows by how fast a metric is growing, fastest first"""
+    trends = compute_trends(points, moving_average_window)
+    
+    # A trend needs at least two snapshots
+    candidates = np.flatnonzero(trends['snapshots'] >= 2)
+    if not len(candidates):
+        return []
+    
+    order = candidates[np.argsort(-trends['velocity_per_day'][candidates], kind='stable')][:limit]
+    
+    return [
+        {
+            'workflow_id': int(trends['workflow_id'][i]),
+            'snapshots': int(trends['snapshots'][i]),
+            'first_value': float(trends['first_value'][i]),
+            'last_value': float(trends['last_value'][i]),
+            'delta': float(trends['delta'][i]),
+            'growth_rate_percent': round(float(trends['growth_rate_percent'][i]), 2),
+            'velocity_per_day': round(float(trends['velocity_per_day'][i]), 2),
+            'moving_average_velocity': round(float(trends['moving_average_velocity'][i]), 2)
+        }
+        for i in order
+    ]
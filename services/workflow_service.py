@@ -1,67 +1,316 @@
-from collectors import YouTubeCollector, ForumCollector, GoogleTrendsCollector
-from database import DatabaseManager
-from schema import WorkflowMetrics
-from typing import Dict, List
-from config import logger
+from collectors import YouTubeCollector, ForumCollector, GoogleTrendsCollector, HttpCache, HttpClient
+from database import DatabaseManager, LeaseLostError
+from schema import WorkflowMetrics, SourceReport, CollectionReport
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from config import logger, SOURCE_TIMEOUTS
+from monitoring.instruments import COLLECTION_LAST_SUCCESS_TIMESTAMP, COLLECTION_ROWS_TOTAL, COLLECTION_SOURCE_SECONDS
+from .clustering import cluster_titles
+from .export import ColumnarExporter
+from .scoring import SCORING_METRICS, score_workflows
+from .trend_analysis import rank_trending
+from datetime import datetime
+from functools import cached_property
+import asyncio
+import threading
+import time
+
+# Persists one batch of collected workflows; passed to collectors that stream their results
+BatchSaver = Callable[[List[WorkflowMetrics]], Awaitable[None]]
+SourceCollector = Callable[[BatchSaver], Awaitable[List[WorkflowMetrics]]]
+
+class _locked_cached_property(cached_property):
+    """cached_property whose first build is serialized, for attributes that worker threads may touch first
+    
+    cached_property itself no longer locks on Python 3.12+, so two threads could each build an instance.
+    """
+    
+    def __init__(self, func):
+        super().__init__(func)
+        self._build_lock = threading.Lock()
+    
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # Only reached until the value is cached; afterwards the instance attribute shadows this descriptor
+        with self._build_lock:
+            if self.attrname in instance.__dict__:
+                return instance.__dict__[self.attrname]
+            return super().__get__(instance, owner)
 
 class WorkflowCollectorService:
     """Main service that orchestrates all data collection"""
     
+    COUNTRIES = ['US', 'IN']
+    
     def __init__(self, youtube_api_key: str):
-        self.youtube_collector = YouTubeCollector(youtube_api_key)
-        self.forum_collector = ForumCollector()
-        self.trends_collector = GoogleTrendsCollector()
-        self.db_manager = DatabaseManager()
-    
-    async def collect_all_workflows(self) -> Dict[str, List[WorkflowMetrics]]:
-        """Collect workflows from all sources"""
-        all_workflows = {
-            'YouTube': [],
-            'Forum': [],
-            'Google': []
-        }
-        
-        countries = ['US', 'IN']
-        
-        # Collect YouTube data
-        for country in countries:
-            try:
-                youtube_workflows = await self.youtube_collector.search_n8n_workflows(country)
-                all_workflows['YouTube'].extend(youtube_workflows)
-                logger.info(f"✅ Collected {len(youtube_workflows)} YouTube workflows for {country}")
-            except Exception as e:
-                logger.error(f"❌ YouTube collection failed for {country}: {e}")
+        # Collectors, caches and the database are built on first use so importing the app stays cheap
+        self.youtube_api_key = youtube_api_key
+        # (name, holder) of the leader lease when several processes share the database; saves are fenced by it
+        self.lease: Optional[Tuple[str, str]] = None
+    
+    @_locked_cached_property
+    def http_cache(self) -> HttpCache:
+        return HttpCache()
+    
+    @cached_property
+    def http_client(self) -> HttpClient:
+        # One connection pool and set of circuit breakers for every collector
+        return HttpClient()
+    
+    @cached_property
+    def youtube_collector(self) -> YouTubeCollector:
+        return YouTubeCollector(self.youtube_api_key, cache=self.http_cache, http_client=self.http_client)
+    
+    @cached_property
+    def forum_collector(self) -> ForumCollector:
+        return ForumCollector(cache=self.http_cache, http_client=self.http_client)
+    
+    @cached_property
+    def trends_collector(self) -> GoogleTrendsCollector:
+        return GoogleTrendsCollector(cache=self.http_cache, http_client=self.http_client)
+    
+    async def close(self):
+        """Release pooled upstream connections"""
+        if 'http_client' in self.__dict__:
+            await self.http_client.close()
+    
+    @_locked_cached_property
+    def db_manager(self) -> DatabaseManager:
+        return DatabaseManager()
+    
+    @cached_property
+    def exporter(self) -> ColumnarExporter:
+        return ColumnarExporter(self.db_manager)
+    
+    async def collect_all_workflows(self, report: CollectionReport = None) -> CollectionReport:
+        """Collect workflows from all sources concurrently, saving each source as soon as it finishes"""
+        return await self._run_collection({
+            'YouTube': self._collect_youtube,
+            'Forum': self._collect_forum,
+            'Google': self._collect_trends
+        }, report)
+    
+    async def refresh_known_workflows(self, report: CollectionReport = None) -> CollectionReport:
+        """Cheap incremental run: re-poll statistics for known video and topic IDs without searching"""
+        return await self._run_collection({
+            'YouTube': self._refresh_youtube,
+            'Forum': self._refresh_forum
+        }, report)
+    
+    async def _run_collection(self, sources: Dict[str, SourceCollector],
+                              report: CollectionReport = None) -> CollectionReport:
+        """Run the given sources concurrently, then do post-collection maintenance; `report` is filled in live"""
+        report = report or CollectionReport(started_at=datetime.now().isoformat())
+        for source in sources:
+            report.sources[source] = SourceReport(source=source)
+        start = time.perf_counter()
+        
+        await asyncio.gather(*(
+            self._run_source(source, collect, report)
+            for source, collect in sources.items()
+        ))
+        
+        # A process that lost leadership mid-run leaves the maintenance writes to the new leader
+        if self.lease and not await asyncio.to_thread(self.db_manager.holds_lease, *self.lease):
+            raise LeaseLostError(f"Lost the '{self.lease[0]}' lease during collection")
+        
+        await self._finalize_collection()
+        
+        report.finished_at = datetime.now().isoformat()
+        report.duration_seconds = round(time.perf_counter() - start, 3)
         
-        # Collect Forum data
+        if report.total_count:
+            logger.info(f"💾 Saved {report.total_count} total workflows to database in {report.duration_seconds}s")
+        else:
+            logger.warning("⚠️ No workflows collected from any source!")
+        
+        return report
+    
+    async def _finalize_collection(self):
+        """Post-collection maintenance: refresh rollups, prune history, group near-duplicates, rank and export"""
         try:
-            forum_workflows = await self.forum_collector.collect_popular_topics()
-            all_workflows['Forum'].extend(forum_workflows)
-            logger.info(f"✅ Collected {len(forum_workflows)} Forum workflows")
+            await asyncio.to_thread(self.db_manager.refresh_summary)
         except Exception as e:
-            logger.error(f"❌ Forum collection failed: {e}")
+            logger.error(f"❌ Summary refresh failed: {e}")
         
-        # Collect Google Trends data
-        for country in countries:
+        try:
+            await asyncio.to_thread(self.db_manager.prune_snapshots)
+        except Exception as e:
+            logger.error(f"❌ Snapshot pruning failed: {e}")
+        
+        try:
+            await asyncio.to_thread(self.update_clusters)
+        except Exception as e:
+            logger.error(f"❌ Clustering failed: {e}")
+        
+        try:
+            await asyncio.to_thread(self.update_rankings)
+        except Exception as e:
+            logger.error(f"❌ Ranking update failed: {e}")
+        
+        try:
+            await asyncio.to_thread(self.exporter.export)
+        except Exception as e:
+            logger.error(f"❌ Columnar export failed: {e}")
+    
+    def update_clusters(self):
+        """Assign near-duplicate workflows across platforms to shared clusters"""
+        self.db_manager.save_clusters(cluster_titles(self.db_manager.get_titles()))
+    
+    def update_rankings(self):
+        """Score every workflow on a unified scale and persist the ranking index"""
+        rows = self.db_manager.get_scoring_inputs(SCORING_METRICS)
+        self.db_manager.save_rankings(score_workflows(rows))
+    
+    async def _run_source(self, source: str, collect: SourceCollector, report: CollectionReport):
+        """Collect a single source under its deadline and commit its results, batch by batch if it streams them"""
+        source_report = report.sources[source]
+        timeout = SOURCE_TIMEOUTS.get(source)
+        start = time.perf_counter()
+        
+        async def save(workflows: List[WorkflowMetrics]):
+            # Keep SQLite writes off the event loop
+            # The summary is rebuilt once in _finalize_collection rather than on every batch
+            await asyncio.to_thread(self.db_manager.save_workflows, workflows, self.lease, False)
+            source_report.count += len(workflows)
+        
+        try:
+            workflows = await asyncio.wait_for(collect(save), timeout=timeout)
+            if workflows:
+                await save(workflows)
+            source_report.status = "success"
+            COLLECTION_LAST_SUCCESS_TIMESTAMP.set(time.time(), source)
+        except asyncio.TimeoutError:
+            source_report.status = "timeout"
+            source_report.error = f"Timed out after {timeout}s"
+            logger.error(f"❌ {source} collection timed out after {timeout}s")
+        except Exception as e:
+            source_report.status = "failed"
+            source_report.error = str(e)
+            logger.error(f"❌ {source} collection failed: {e}")
+        finally:
+            source_report.duration_seconds = round(time.perf_counter() - start, 3)
+            COLLECTION_SOURCE_SECONDS.observe(source_report.duration_seconds, source, source_report.status)
+            COLLECTION_ROWS_TOTAL.inc(source, amount=source_report.count)
+    
+    async def _collect_youtube(self, save: BatchSaver = None) -> List[WorkflowMetrics]:
+        """Collect YouTube data for all countries concurrently"""
+        workflows = []
+        youtube_results = await self.youtube_collector.search_all_countries(self.COUNTRIES)
+        for country, youtube_workflows in youtube_results.items():
+            workflows.extend(youtube_workflows)
+            logger.info(f"✅ Collected {len(youtube_workflows)} YouTube workflows for {country}")
+        return workflows
+    
+    async def _refresh_youtube(self, save: BatchSaver = None) -> List[WorkflowMetrics]:
+        """Refresh statistics for known YouTube videos in 50-ID batches"""
+        known_ids = await asyncio.to_thread(self.db_manager.get_source_ids, "YouTube")
+        workflows = []
+        youtube_results = await self.youtube_collector.refresh_statistics(known_ids)
+        for country, youtube_workflows in youtube_results.items():
+            workflows.extend(youtube_workflows)
+            logger.info(f"🔄 Refreshed {len(youtube_workflows)} YouTube workflows for {country}")
+        return workflows
+    
+    async def _refresh_forum(self, save: BatchSaver = None) -> List[WorkflowMetrics]:
+        """Refresh the most viewed known Forum topics by ID, as many as fit in one run, saving them in batches"""
+        # One request per topic, so only the top of the table fits in the Forum deadline
+        known_ids = await asyncio.to_thread(self.db_manager.get_source_ids, "Forum",
+                                            self.forum_collector.refresh_max_topics)
+        topic_ids = [topic_id for topic_ids in known_ids.values() for topic_id in topic_ids]
+        refreshed = 0
+        
+        async def save_batch(batch: List[WorkflowMetrics]):
+            nonlocal refreshed
+            await save(batch)
+            refreshed += len(batch)
+            logger.info(f"💾 Saved batch of {len(batch)} refreshed Forum workflows ({refreshed} so far)")
+        
+        forum_workflows = await self.forum_collector.refresh_topics(topic_ids, on_batch=save_batch if save else None)
+        logger.info(f"🔄 Refreshed {refreshed + len(forum_workflows)} of {len(topic_ids)} Forum workflows")
+        return forum_workflows
+    
+    async def _collect_forum(self, save: BatchSaver = None) -> List[WorkflowMetrics]:
+        """Crawl the Forum, saving topics in batches as they arrive when `save` is given"""
+        collected = 0
+        
+        async def save_batch(batch: List[WorkflowMetrics]):
+            nonlocal collected
+            await save(batch)
+            collected += len(batch)
+            logger.info(f"💾 Saved batch of {len(batch)} Forum workflows ({collected} so far)")
+        
+        forum_workflows = await self.forum_collector.collect_popular_topics(on_batch=save_batch if save else None)
+        logger.info(f"✅ Collected {collected + len(forum_workflows)} Forum workflows")
+        return forum_workflows
+    
+    async def _collect_trends(self, save: BatchSaver = None) -> List[WorkflowMetrics]:
+        """Collect Google Trends data, one country at a time through the Trends worker"""
+        workflows = []
+        for country in self.COUNTRIES:
             try:
-                trends_workflows = self.trends_collector.collect_trending_workflows(country)
-                all_workflows['Google'].extend(trends_workflows)
+                trends_workflows = await self.trends_collector.collect_trending_workflows(country)
+                workflows.extend(trends_workflows)
                 logger.info(f"✅ Collected {len(trends_workflows)} Google Trends workflows for {country}")
             except Exception as e:
                 logger.error(f"❌ Google Trends collection failed for {country}: {e}")
-        
-        # Save to database
-        all_workflow_list = []
-        for platform_workflows in all_workflows.values():
-            all_workflow_list.extend(platform_workflows)
-        
-        if all_workflow_list:
-            self.db_manager.save_workflows(all_workflow_list)
-            logger.info(f"💾 Saved {len(all_workflow_list)} total workflows to database")
-        else:
-            logger.warning("⚠️ No workflows collected from any source!")
-        
-        return all_workflows
+        return workflows
     
     def get_workflows_from_db(self, platform: str = None, country: str = None) -> List[Dict]:
         """Get workflows from database with optional filters"""
-        return self.db_manager.get_workflows(platform, country)
\ No newline at end of file
+        return self.db_manager.get_workflows(platform, country)
+    
+    def get_workflow_page_from_db(self, platform: str = None, country: str = None, sort_by: str = None,
+                                  order: str = None, limit: int = None,
+                                  cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one sorted page of workflows from database and the cursor for the next page"""
+        return self.db_manager.get_workflows_page(platform, country, sort_by, order, limit, cursor)
+    
+    def search_workflows_from_db(self, query: str, platform: str = None, country: str = None,
+                                 limit: int = 20) -> List[Dict]:
+        """Full-text search workflow titles in database"""
+        return self.db_manager.search_workflows(query, platform, country, limit)
+    
+    def get_workflow_stats_from_db(self) -> Dict:
+        """Get precomputed collection statistics from database"""
+        return self.db_manager.get_workflow_stats()
+    
+    def get_data_age_hours(self) -> Optional[float]:
+        """Hours since the newest workflow was collected, or None if nothing has been collected yet"""
+        last_updated = self.db_manager.get_last_updated()
+        if not last_updated:
+            return None
+        return (datetime.now() - datetime.fromisoformat(last_updated)).total_seconds() / 3600
+    
+    def get_data_generation(self) -> int:
+        """Get the database generation, which changes whenever collected data is saved"""
+        return self.db_manager.get_generation()
+    
+    def iter_workflow_rows_from_db(self, platform: str = None, country: str = None, sort_by: str = None,
+                                   order: str = None) -> Iterator[List[Tuple]]:
+        """Stream workflow rows from database in batches"""
+        return self.db_manager.iter_workflow_rows(platform, country, sort_by, order)
+    
+    def get_trending_workflows(self, metric: str = "views", days: int = 7, platform: str = None,
+                               country: str = None, limit: int = 20) -> List[Dict]:
+        """Get the workflows whose metric grew fastest over the last `days` days"""
+        since = int(time.time()) - days * 86400
+        points = self.db_manager.get_snapshot_series(metric, since, platform, country)
+        trends = rank_trending(points, limit)
+        workflows = self.db_manager.get_workflows_by_ids([trend['workflow_id'] for trend in trends])
+        
+        results = []
+        for trend in trends:
+            workflow = workflows.get(trend.pop('workflow_id'))
+            if workflow:
+                results.append({**workflow, 'trend': trend})
+        return results
+    
+    def get_top_workflows(self, platform: str = None, country: str = None, limit: int = 20) -> List[Dict]:
+        """Get the highest scoring workflows across platforms from the ranking index"""
+        return self.db_manager.get_top_workflows(platform, country, limit)
+    
+    def get_workflow_clusters(self, platform: str = None, country: str = None, min_size: int = 1,
+                              limit: int = 20) -> List[Dict]:
+        """Get aggregated popularity per cluster of near-duplicate workflows"""
+        return self.db_manager.get_clusters(platform, country, min_size, limit)